@@ -0,0 +1,51 @@
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from tracking import create_kalman_filter  # noqa: E402
+from pose_filter import ConstantAccelerationFilter  # noqa: E402
+
+
+class FilterBenchmark:
+
+    def __init__(self, updates=20000, delta_time=0.0334):
+        self.updates = updates
+        self.delta_time = delta_time
+
+        # A target moving and turning smoothly, with measurement noise.
+        random = np.random.RandomState(0)
+        times = np.arange(updates) * delta_time
+        self.measurements = np.stack([
+            10 * np.sin(times), 5 * np.cos(0.5 * times), 80 + times,
+            0.3 * np.sin(times), 0.2 * np.cos(times), 0.1 * times], axis=1) + random.normal(0, 0.05, (updates, 6))
+
+    def run(self):
+        opencv_time, opencv_states = self.__run_filter(create_kalman_filter(18, 6, self.delta_time))
+        numpy_time, numpy_states = self.__run_filter(ConstantAccelerationFilter(self.delta_time))
+
+        print("updates: {}".format(self.updates))
+        print("cv2.KalmanFilter: {:.2f} us/update".format(opencv_time / self.updates * 1e6))
+        print("ConstantAccelerationFilter: {:.2f} us/update".format(numpy_time / self.updates * 1e6))
+        print("speedup: {:.2f}x".format(opencv_time / numpy_time))
+        print("max state difference: {:.3e}".format(np.max(np.abs(opencv_states - numpy_states))))
+
+    def __run_filter(self, filter):
+        states = np.zeros((self.updates, 18))
+
+        start = time.perf_counter()
+        for i in range(self.updates):
+            filter.predict()
+            filter.correct(self.measurements[i])
+            states[i] = filter.statePost.ravel()
+        elapsed = time.perf_counter() - start
+
+        return elapsed, states
+
+
+if __name__ == "__main__":
+
+    filter_benchmark = FilterBenchmark()
+    filter_benchmark.run()
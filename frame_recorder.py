@@ -0,0 +1,60 @@
+import os
+import sys
+import argparse
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from frame_capture import LatestFrameCapture
+from frame_recording import FrameRecorder, RAW_COMPRESSION, PNG_COMPRESSION, RECORDING_EXTENSION
+
+
+class FrameRecorderTool:
+
+    def __init__(self, source, path, compression, frame_width, frame_height, show_video):
+        self.__frame_capture = LatestFrameCapture(source, frame_width, frame_height)
+        self.__recorder = FrameRecorder(path, compression)
+        self.__show_video = show_video
+
+    def run(self):
+        # Frames are stamped exactly as tracking would stamp them, replaying
+        # the recording as a tracking source gives back the same input.
+        self.__frame_capture.start()
+        try:
+            while True:
+                captured, frame, capture_timestamp = self.__frame_capture.read()
+                if not captured:
+                    break
+
+                self.__recorder.write(frame, capture_timestamp)
+
+                if self.__show_video:
+                    cv2.imshow("FRAME RECORDING", frame)
+
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.__frame_capture.release()
+            self.__recorder.close()
+            cv2.destroyAllWindows()
+
+        print("{} frames recorded".format(self.__recorder.frames))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Records a video source to replay it as a tracking source")
+    parser.add_argument('path', help="recording file, ending in {}".format(RECORDING_EXTENSION))
+    parser.add_argument('--source', type=int, default=0, help="video source device number")
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--png', action='store_true', help="lossless PNG frames instead of raw ones")
+    parser.add_argument('--no-preview', action='store_true', help="record without a window, stop with Ctrl+C")
+    args = parser.parse_args()
+
+    if not args.path.endswith(RECORDING_EXTENSION):
+        parser.error("the recording path must end in {}".format(RECORDING_EXTENSION))
+
+    FrameRecorderTool(args.source, args.path, PNG_COMPRESSION if args.png else RAW_COMPRESSION,
+                      args.width, args.height, not args.no_preview).run()
@@ -1,13 +1,37 @@
 import socket
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from pose_packet import is_pose_packet, decode_pose_packet  # noqa: E402
+from video_transport import FrameReassembler, is_video_chunk  # noqa: E402
 
 # Create a UDP socket
 sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 
+# Room for the burst of chunks of a whole video frame
+sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+
 # Connect the socket to the port where the server is listening
 sock.bind(('localhost', 10000))
 
+# Video frames arrive in chunks and are put back together here.
+frame_reassembler = FrameReassembler()
+
 while True:
-    data, addr = sock.recvfrom(4096)  # buffer size is 1024 bytes
+    data, addr = sock.recvfrom(65535)
+
+    if is_video_chunk(data):
+        frame = frame_reassembler.add(data)
+        if frame is not None:
+            frame_id, encoded_frame = frame
+            print('received video frame {} of {} bytes, {} incomplete frames dropped'.format(
+                frame_id, len(encoded_frame), frame_reassembler.dropped_frames))
+        continue
+
     os.system('cls' if os.name == 'nt' else "printf '\033c'")
-    print('received {}'.format(data.decode()))
+    if is_pose_packet(data):
+        print('received {}'.format(decode_pose_packet(data)))
+    else:
+        print('received {}'.format(data.decode()))
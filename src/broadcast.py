@@ -0,0 +1,65 @@
+import asyncio
+import threading
+
+
+class LatestValueSlot:
+
+    def __init__(self):
+        self.__value = None
+        self.__event = asyncio.Event()
+
+    def put(self, value):
+        # Overwrites a value the client did not get to yet.
+        self.__value = value
+        self.__event.set()
+
+    async def get(self):
+        await self.__event.wait()
+        self.__event.clear()
+
+        return self.__value
+
+
+class BroadcastHub:
+
+    def __init__(self):
+        # One slot per connected client, a slow client only loses its own
+        # intermediate values and never holds back the others.
+        self.__slots = set()
+
+    def subscribe(self):
+        slot = LatestValueSlot()
+        self.__slots.add(slot)
+
+        return slot
+
+    def unsubscribe(self, slot):
+        self.__slots.discard(slot)
+
+    def clients(self):
+        return len(self.__slots)
+
+    def publish(self, value):
+        # Must run on the event loop thread.
+        for slot in self.__slots:
+            slot.put(value)
+
+
+class AsyncQueueBridge:
+
+    def __init__(self, queue):
+        self.__queue = queue
+        self.__thread = None
+
+    def start(self, loop, callback):
+        # Blocks on the process queue off the event loop, and wakes the loop
+        # with callback(item) as soon as an item arrives.
+        self.__thread = threading.Thread(target=self.__read, args=(loop, callback), daemon=True)
+        self.__thread.start()
+
+        return self
+
+    def __read(self, loop, callback):
+        while True:
+            item = self.__queue.get()
+            loop.call_soon_threadsafe(callback, item)
@@ -0,0 +1,239 @@
+from multiprocessing import Process, Queue, parent_process
+import queue
+import threading
+import time
+import cv2
+from frame_buffer import SharedFrameRing
+from pose_estimation import MarkerPoseEstimator
+
+NO_MEASUREMENT = ((), None, {})
+
+# How long the dispatcher waits on a frame before checking for a stop.
+DISPATCH_POLL = 0.1
+
+
+class InlineDetection:
+
+    def __init__(self, targets, detection_engine_settings, translation_offset):
+        self.__estimator = MarkerPoseEstimator(
+            targets, detection_engine_settings, translation_offset)
+        self.__frame_capture = None
+        self.__region = None
+        self.__capture_time = 0.0
+
+    def start(self, frame_capture, region):
+        self.__frame_capture = frame_capture
+        self.__region = region
+
+        return self
+
+    def next_result(self):
+        start = time.perf_counter()
+        captured, frame, capture_timestamp = self.__frame_capture.read()
+        self.__capture_time = time.perf_counter() - start
+        if not captured:
+            return None
+
+        return frame, capture_timestamp, self.__estimator.estimate(frame, self.__region())
+
+    def stage_times(self):
+        # Seconds spent on each stage of the last result, capture being the
+        # wait for its frame.
+        return dict(self.__estimator.stage_times, capture=self.__capture_time)
+
+    def dropped_frames(self):
+        return self.__frame_capture.dropped_frames
+
+    def stop(self):
+        pass
+
+
+class DetectionWorkerPool:
+
+    def __init__(self, workers, targets, detection_engine_settings, translation_offset):
+        self.__workers = workers
+        self.__targets = targets
+        self.__detection_engine_settings = detection_engine_settings
+        self.__translation_offset = translation_offset
+        self.__max_in_flight = 2 * workers
+        self.__frame_ring = None
+        self.__tasks = Queue()
+        self.__results = Queue()
+        self.__processes = []
+
+        self.__in_flight = threading.Semaphore(self.__max_in_flight)
+        self.__pending_lock = threading.Lock()
+        self.__pending = {}
+        self.__completed = {}
+        self.__next_sequence = 1
+        self.__end_sequence = None
+        self.__dispatch_thread = None
+        self.__stopping = threading.Event()
+        self.__frame_capture = None
+        self.__stage_times = {}
+
+    def start(self, frame_capture, region):
+        self.__frame_capture = frame_capture
+
+        # The ring is sized from the first frame, cameras may not deliver the
+        # requested size. Frames stay in the ring until their result is
+        # emitted, so it needs one more slot than the frames allowed in flight.
+        first_frame = self.__read_frame(frame_capture)
+        if first_frame is not None and first_frame[0]:
+            self.__frame_ring = SharedFrameRing(
+                slots=self.__max_in_flight + 1, max_frame_shape=first_frame[1].shape)
+            self.__processes = [Process(target=DetectionWorker(
+                frame_ring=self.__frame_ring,
+                tasks=self.__tasks,
+                results=self.__results,
+                targets=self.__targets,
+                detection_engine_settings=self.__detection_engine_settings,
+                translation_offset=self.__translation_offset).run, daemon=True) for _ in range(self.__workers)]
+
+        for process in self.__processes:
+            process.start()
+
+        self.__dispatch_thread = threading.Thread(
+            target=self.__dispatch, args=(frame_capture, region, first_frame), daemon=True)
+        self.__dispatch_thread.start()
+
+        return self
+
+    def next_result(self):
+        # Results are handed out strictly in frame order, whatever order the
+        # workers finish in.
+        while self.__next_sequence not in self.__completed:
+            if self.__end_sequence is not None and self.__next_sequence >= self.__end_sequence:
+                return None
+
+            try:
+                sequence, measurement, stage_times = self.__results.get(timeout=1.0)
+            except queue.Empty:
+                if not all(process.is_alive() for process in self.__processes):
+                    raise Exception("A detection worker stopped unexpectedly")
+                continue
+
+            if sequence is None:
+                self.__end_sequence = measurement
+            else:
+                self.__completed[sequence] = (measurement, stage_times)
+
+        sequence = self.__next_sequence
+        self.__next_sequence += 1
+        measurement, stage_times = self.__completed.pop(sequence)
+        with self.__pending_lock:
+            frame, capture_timestamp, capture_time = self.__pending.pop(sequence)
+        self.__in_flight.release()
+        self.__stage_times = dict(stage_times, capture=capture_time)
+
+        if measurement is None:
+            measurement = NO_MEASUREMENT
+
+        return frame, capture_timestamp, measurement
+
+    def stage_times(self):
+        # Worker stages of the last result, and the dispatcher's wait for its frame.
+        return self.__stage_times
+
+    def dropped_frames(self):
+        return self.__frame_capture.dropped_frames
+
+    def stop(self):
+        # The dispatcher is stopped first, it must not write to the ring nor
+        # read the capture once they are released.
+        self.__stopping.set()
+        self.__in_flight.release()
+        if self.__dispatch_thread is not None:
+            self.__dispatch_thread.join()
+
+        for _ in self.__processes:
+            self.__tasks.put(None)
+
+        for process in self.__processes:
+            process.join(1.0)
+            if process.is_alive():
+                process.terminate()
+
+        if self.__frame_ring is not None:
+            self.__frame_ring.release()
+
+    def __dispatch(self, frame_capture, region, next_frame):
+        sequence = 0
+        while True:
+            self.__in_flight.acquire()
+            if self.__stopping.is_set():
+                break
+
+            if next_frame is None:
+                next_frame = self.__read_frame(frame_capture)
+            if next_frame is None:
+                break
+            captured, frame, capture_timestamp, capture_time = next_frame
+            next_frame = None
+            if not captured:
+                self.__results.put((None, sequence + 1, None))
+                break
+
+            sequence += 1
+            with self.__pending_lock:
+                self.__pending[sequence] = (frame, capture_timestamp, capture_time)
+
+            if not self.__frame_ring.fits(frame):
+                # Larger than the first frame, left without a measurement
+                # rather than detected on a scaled down copy.
+                self.__results.put((sequence, None, {}))
+                continue
+
+            ring_sequence = self.__frame_ring.write(frame, capture_timestamp)
+            self.__tasks.put((sequence, ring_sequence, region()))
+
+    def __read_frame(self, frame_capture):
+        # None once stopping, the capture is not read anymore.
+        start = time.perf_counter()
+        while not self.__stopping.is_set():
+            captured, frame, capture_timestamp = frame_capture.read(DISPATCH_POLL)
+            if captured or frame_capture.ended():
+                return captured, frame, capture_timestamp, time.perf_counter() - start
+
+        return None
+
+
+class DetectionWorker:
+
+    def __init__(self, frame_ring, tasks, results, targets, detection_engine_settings, translation_offset):
+        self.__frame_ring = frame_ring
+        self.__tasks = tasks
+        self.__results = results
+        self.__targets = targets
+        self.__detection_engine_settings = detection_engine_settings
+        self.__translation_offset = translation_offset
+
+    def run(self):
+        # Parallelism comes from the pool, not from OpenCV threads.
+        cv2.setNumThreads(1)
+        estimator = MarkerPoseEstimator(
+            self.__targets, self.__detection_engine_settings, self.__translation_offset)
+
+        while True:
+            try:
+                task = self.__tasks.get(timeout=1.0)
+            except queue.Empty:
+                # The tracker may have been terminated without stopping the pool.
+                if not parent_process().is_alive():
+                    break
+                continue
+
+            if task is None:
+                break
+
+            sequence, ring_sequence, region = task
+            frame, _ = self.__frame_ring.read(ring_sequence)
+            measurement = None
+            stage_times = {}
+            if frame is not None:
+                measurement = estimator.estimate(frame, region)
+                stage_times = estimator.stage_times
+                if not self.__frame_ring.is_valid(ring_sequence):
+                    measurement = None
+
+            self.__results.put((sequence, measurement, stage_times))
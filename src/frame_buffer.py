@@ -0,0 +1,148 @@
+import os
+from multiprocessing import Condition, shared_memory
+import numpy as np
+import cv2
+
+MAX_FRAME_SHAPE = (1080, 1920, 3)
+
+# Latest sequence, video subscribers.
+HEADER_FIELDS = 2
+# Per slot: sequence, height, width, channels.
+SLOT_INFO_FIELDS = 4
+
+
+class SharedFrameRing:
+
+    def __init__(self, slots=4, max_frame_shape=MAX_FRAME_SHAPE):
+        self.__slots = slots
+        self.__slot_size = int(np.prod(max_frame_shape))
+        self.__shared_memory = shared_memory.SharedMemory(
+            create=True, size=self.__memory_size(slots, self.__slot_size))
+        # Forked processes inherit the ring without unpickling it, only the
+        # creating process unlinks the memory.
+        self.__owner_pid = os.getpid()
+        self.__condition = Condition()
+        self.__map_views()
+        self.__header[:] = 0
+
+    def __getstate__(self):
+        return {
+            'name': self.__shared_memory.name,
+            'slots': self.__slots,
+            'slot_size': self.__slot_size,
+            'condition': self.__condition}
+
+    def __setstate__(self, state):
+        self.__slots = state['slots']
+        self.__slot_size = state['slot_size']
+        self.__shared_memory = shared_memory.SharedMemory(name=state['name'])
+        self.__owner_pid = None
+        self.__condition = state['condition']
+        self.__map_views()
+
+    def fits(self, frame):
+        return frame.size <= self.__slot_size
+
+    def write(self, frame, timestamp):
+        if not self.fits(frame):
+            # Cameras may ignore the requested size and recordings keep their
+            # own. Larger frames are scaled down to fit, never refused.
+            scale = (self.__slot_size / frame.size) ** 0.5
+            frame = cv2.resize(frame, (max(1, int(frame.shape[1] * scale)), max(1, int(frame.shape[0] * scale))),
+                               interpolation=cv2.INTER_AREA)
+
+        height, width = frame.shape[0], frame.shape[1]
+        channels = frame.size // (height * width)
+
+        sequence = int(self.__header[0]) + 1
+        slot = sequence % self.__slots
+        slot_info = self.__slot_info[slot]
+
+        # Readers holding a view of this slot see the sequence change and drop it.
+        slot_info[0] = -1
+        self.__frames[slot, :frame.size] = frame.reshape(-1)
+        slot_info[1:] = (height, width, channels)
+        self.__timestamps[slot] = timestamp
+        slot_info[0] = sequence
+        self.__header[0] = sequence
+
+        with self.__condition:
+            self.__condition.notify_all()
+
+        return sequence
+
+    def wait(self, last_sequence, timeout=None):
+        with self.__condition:
+            self.__condition.wait_for(
+                lambda: self.__header[0] > last_sequence, timeout)
+
+        return self.latest()
+
+    def latest(self):
+        sequence = int(self.__header[0])
+        frame, timestamp = self.read(sequence)
+
+        return sequence, frame, timestamp
+
+    def read(self, sequence):
+        # The returned frame is a read only view into shared memory, check
+        # is_valid(sequence) once done with it to detect a concurrent overwrite.
+        slot = sequence % self.__slots
+        slot_info = self.__slot_info[slot]
+
+        if sequence == 0 or slot_info[0] != sequence:
+            return None, None
+
+        height, width, channels = (int(value) for value in slot_info[1:])
+        frame = self.__frames[slot, :height * width * channels].reshape(
+            height, width, channels)
+        frame.flags.writeable = False
+        timestamp = float(self.__timestamps[slot])
+
+        if not self.is_valid(sequence):
+            return None, None
+
+        return frame, timestamp
+
+    def subscribers(self):
+        return int(self.__header[1])
+
+    def add_subscribers(self, count):
+        # Producers skip drawing and writing frames while nobody reads them.
+        with self.__condition:
+            self.__header[1] += count
+
+    def is_valid(self, sequence):
+        return self.__slot_info[sequence % self.__slots][0] == sequence
+
+    def release(self):
+        self.__header = None
+        self.__slot_info = None
+        self.__timestamps = None
+        self.__frames = None
+        self.__shared_memory.close()
+
+        if self.__owner_pid == os.getpid():
+            self.__shared_memory.unlink()
+
+    def __map_views(self):
+        buffer = self.__shared_memory.buf
+        offset = 0
+
+        self.__header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=buffer, offset=offset)
+        offset += self.__header.nbytes
+
+        self.__slot_info = np.ndarray(
+            (self.__slots, SLOT_INFO_FIELDS), dtype=np.int64, buffer=buffer, offset=offset)
+        offset += self.__slot_info.nbytes
+
+        self.__timestamps = np.ndarray(
+            (self.__slots,), dtype=np.float64, buffer=buffer, offset=offset)
+        offset += self.__timestamps.nbytes
+
+        self.__frames = np.ndarray(
+            (self.__slots, self.__slot_size), dtype=np.uint8, buffer=buffer, offset=offset)
+
+    @staticmethod
+    def __memory_size(slots, slot_size):
+        return HEADER_FIELDS * 8 + slots * SLOT_INFO_FIELDS * 8 + slots * 8 + slots * slot_size
@@ -0,0 +1,121 @@
+import threading
+import time
+import cv2
+from frame_recording import ReplayFrameCapture, ReplayVideoCapture, is_recording
+
+
+class LatestFrameCapture:
+
+    def __init__(self, video_source, frame_width=1280, frame_height=720):
+        self.__video_source = video_source
+        self.__frame_width = frame_width
+        self.__frame_height = frame_height
+        self.__condition = threading.Condition()
+        self.__video_capture = None
+        self.__thread = None
+        self.__running = False
+        self.__frame = None
+        self.__timestamp = None
+        self.__sequence = 0
+        self.__read_sequence = 0
+        self.__lost = False
+        # Frames captured but replaced before they were read.
+        self.dropped_frames = 0
+
+    def start(self):
+        #Descomentar quando nao for utilizar o DroidCam
+        #self.__video_capture = cv2.VideoCapture(
+            #self.__video_source, cv2.CAP_DSHOW)
+        self.__video_capture = cv2.VideoCapture(self.__video_source)
+        if not self.__video_capture.isOpened():
+            self.release()
+            raise IOError("Could not open video source {}".format(self.__video_source))
+
+        self.__video_capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.__frame_width)
+        self.__video_capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.__frame_height)
+        # Not every backend honours this, the capture thread drains the rest.
+        self.__video_capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        # Some sources open but never give a frame.
+        grabbed, frame = self.__video_capture.read()
+        if not grabbed:
+            self.release()
+            raise IOError("Video source {} gives no frames".format(self.__video_source))
+        self.__frame = frame
+        self.__timestamp = time.time()
+        self.__sequence = 1
+
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__capture, daemon=True)
+        self.__thread.start()
+
+        return self
+
+    def read(self, timeout=None):
+        # Blocks until a frame newer than the last one returned is available.
+        # Frames captured in between are dropped, never queued.
+        with self.__condition:
+            self.__condition.wait_for(
+                lambda: self.__sequence != self.__read_sequence or not self.__running, timeout)
+
+            if self.__sequence == self.__read_sequence:
+                return False, None, None
+
+            self.dropped_frames += self.__sequence - self.__read_sequence - 1
+            self.__read_sequence = self.__sequence
+            return True, self.__frame, self.__timestamp
+
+    def ended(self):
+        # Tells a read that timed out from the end of the stream.
+        with self.__condition:
+            return not self.__running and self.__sequence == self.__read_sequence
+
+    def lost(self):
+        # A camera stream only ends on release, otherwise the camera failed
+        # or was unplugged.
+        with self.__condition:
+            return self.__lost
+
+    def release(self):
+        with self.__condition:
+            self.__running = False
+            self.__condition.notify_all()
+
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+        if self.__video_capture is not None:
+            self.__video_capture.release()
+            self.__video_capture = None
+
+    def __capture(self):
+        while self.__running:
+            grabbed, frame = self.__video_capture.read()
+            timestamp = time.time()
+
+            with self.__condition:
+                if grabbed:
+                    self.__frame = frame
+                    self.__timestamp = timestamp
+                    self.__sequence += 1
+                elif self.__running:
+                    self.__running = False
+                    self.__lost = True
+
+                self.__condition.notify_all()
+
+
+def open_frame_capture(video_source, frame_width=1280, frame_height=720, realtime=True, replay_start=None):
+    # A recording path is replayed, anything else is a camera.
+    if is_recording(video_source):
+        return ReplayFrameCapture(video_source, realtime, replay_start)
+
+    return LatestFrameCapture(video_source, frame_width, frame_height)
+
+
+def open_video_capture(video_source):
+    if is_recording(video_source):
+        return ReplayVideoCapture(video_source)
+
+    return cv2.VideoCapture(video_source)
@@ -0,0 +1,223 @@
+import mmap
+import struct
+import threading
+import time
+import numpy as np
+import cv2
+
+RECORDING_EXTENSION = '.frec'
+RECORDING_MAGIC = b'FREC'
+RECORDING_VERSION = 1
+
+RAW_COMPRESSION = 0
+# Lossless and far smaller than raw, but slow enough to encode that the
+# recorder may skip camera frames at high resolutions.
+PNG_COMPRESSION = 1
+
+# Little endian. Header: magic, version, compression, height, width, channels.
+HEADER = struct.Struct('<4sHHIII')
+# Per frame: capture timestamp, payload size, followed by the payload.
+RECORD = struct.Struct('<dI')
+
+# Seconds between choosing a shared replay start and the first frame, for
+# every replaying process to be ready by then.
+REPLAY_START_DELAY = 0.5
+
+
+class FrameRecorder:
+
+    def __init__(self, path, compression=RAW_COMPRESSION):
+        self.__path = path
+        self.__compression = compression
+        self.__file = None
+        self.__shape = None
+        self.frames = 0
+
+    def write(self, frame, timestamp):
+        if self.__file is None:
+            self.__shape = frame.shape
+            self.__file = open(self.__path, 'wb')
+            height, width = frame.shape[0], frame.shape[1]
+            self.__file.write(HEADER.pack(RECORDING_MAGIC, RECORDING_VERSION, self.__compression,
+                                          height, width, frame.size // (height * width)))
+        elif frame.shape != self.__shape:
+            raise ValueError("Frame of shape {} in a recording of shape {}".format(frame.shape, self.__shape))
+
+        if self.__compression == PNG_COMPRESSION:
+            payload = cv2.imencode('.png', frame, [int(cv2.IMWRITE_PNG_COMPRESSION), 1])[1]
+        else:
+            payload = np.ascontiguousarray(frame)
+
+        # Records are appended as they come, a recording cut short by a crash
+        # still replays up to its last complete frame.
+        self.__file.write(RECORD.pack(timestamp, payload.nbytes))
+        self.__file.write(payload.data)
+        self.frames += 1
+
+    def close(self):
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+
+class RecordedFrames:
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.__memory = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.__compression, height, width, channels = HEADER.unpack_from(self.__memory, 0)
+        if magic != RECORDING_MAGIC or version != RECORDING_VERSION:
+            raise ValueError("{} is not a version {} frame recording".format(path, RECORDING_VERSION))
+        self.__shape = (height, width, channels) if channels > 1 else (height, width)
+
+        # Offsets and capture timestamps of every complete frame.
+        self.__offsets = []
+        self.timestamps = []
+        offset = HEADER.size
+        while offset + RECORD.size <= len(self.__memory):
+            timestamp, size = RECORD.unpack_from(self.__memory, offset)
+            offset += RECORD.size
+            if offset + size > len(self.__memory):
+                break
+            self.__offsets.append((offset, size))
+            self.timestamps.append(timestamp)
+            offset += size
+
+    def __len__(self):
+        return len(self.__offsets)
+
+    def read(self, index):
+        # Raw frames are read only views into the mapped file, copy them
+        # before drawing on them.
+        offset, size = self.__offsets[index]
+        if self.__compression == PNG_COMPRESSION:
+            frame = cv2.imdecode(np.frombuffer(self.__memory, np.uint8, size, offset), cv2.IMREAD_UNCHANGED)
+        else:
+            frame = np.frombuffer(self.__memory, np.uint8, size, offset).reshape(self.__shape)
+
+        return frame, self.timestamps[index]
+
+    def close(self):
+        self.__memory.close()
+
+
+class ReplayFrameCapture:
+
+    def __init__(self, path, realtime=True, start=None):
+        # Same interface as LatestFrameCapture. In realtime each frame becomes
+        # available at its original time since the first one, and frames not
+        # read in time are dropped like a live camera would. Otherwise every
+        # frame is returned, in order, as soon as it is asked for, with its
+        # original capture timestamp, so reruns see exactly the same input.
+        # Recordings replayed together share a start from replay_start().
+        self.__path = path
+        self.__realtime = realtime
+        self.__start = start
+        self.__frames = None
+        self.__index = 0
+        self.__start_time = None
+        self.__recorded_start_time = None
+        self.__lock = threading.Lock()
+        self.dropped_frames = 0
+
+    def start(self):
+        self.__frames = RecordedFrames(self.__path)
+        self.__index = 0
+        if self.__start is not None:
+            self.__start_time, self.__recorded_start_time = self.__start
+        else:
+            self.__start_time = time.time()
+            self.__recorded_start_time = self.__frames.timestamps[0] if len(self.__frames) > 0 else 0.0
+
+        return self
+
+    def read(self, timeout=None):
+        with self.__lock:
+            if self.__frames is None or self.__index >= len(self.__frames):
+                return False, None, None
+
+            if not self.__realtime:
+                frame, timestamp = self.__frames.read(self.__index)
+                self.__index += 1
+                return True, frame.copy(), timestamp
+
+            timestamps = self.__frames.timestamps
+            elapsed = time.time() - self.__start_time
+            # Skips to the latest frame already due.
+            while self.__index + 1 < len(timestamps) and timestamps[self.__index + 1] - self.__recorded_start_time <= elapsed:
+                self.__index += 1
+                self.dropped_frames += 1
+
+            delay = timestamps[self.__index] - self.__recorded_start_time - elapsed
+            if delay > 0:
+                if timeout is not None and delay > timeout:
+                    time.sleep(timeout)
+                    return False, None, None
+                time.sleep(delay)
+
+            frame, timestamp = self.__frames.read(self.__index)
+            self.__index += 1
+
+            # Stamped on the replay clock, as if captured now.
+            return True, frame.copy(), self.__start_time + timestamp - self.__recorded_start_time
+
+    def ended(self):
+        with self.__lock:
+            return self.__frames is None or self.__index >= len(self.__frames)
+
+    def lost(self):
+        # Recordings end, they are never lost.
+        return False
+
+    def release(self):
+        with self.__lock:
+            if self.__frames is not None:
+                self.__frames.close()
+                self.__frames = None
+                self.__index = 0
+
+
+class ReplayVideoCapture:
+
+    def __init__(self, path):
+        # The part of cv2.VideoCapture used by the calibration and the cube
+        # mapping, frames come back at their original timing.
+        self.__frame_capture = ReplayFrameCapture(path).start()
+
+    def isOpened(self):
+        return True
+
+    def set(self, property_id, value):
+        # Recordings keep their recorded size.
+        return False
+
+    def read(self):
+        captured, frame, _ = self.__frame_capture.read()
+
+        return captured, frame
+
+    def release(self):
+        self.__frame_capture.release()
+
+
+def replay_start(video_sources):
+    # Replay and recorded start times shared by the recordings among the
+    # video sources. Each one replays at its offset from the earliest, so
+    # frames captured together by several cameras are replayed together.
+    recorded_start_times = []
+    for video_source in video_sources:
+        if is_recording(video_source):
+            frames = RecordedFrames(video_source)
+            if len(frames) > 0:
+                recorded_start_times.append(frames.timestamps[0])
+            frames.close()
+
+    if not recorded_start_times:
+        return None
+
+    return time.time() + REPLAY_START_DELAY, min(recorded_start_times)
+
+
+def is_recording(video_source):
+    return isinstance(video_source, str) and video_source.endswith(RECORDING_EXTENSION)
@@ -0,0 +1,79 @@
+import os
+import sys
+import signal
+import threading
+import argparse
+import multiprocessing
+import numpy as np
+from tracking import TrackingScheduler, TrackingCofig
+from video_source_calibration import SELECTED_CAM_MTX_PATH, SELECTED_DIST_PATH
+
+# Runs tracking without the GUI, the Firebase login nor any window:
+#   python headless.py [--config tracking.json] [--fast-replay] [--metrics-port 9100]
+# Without --config the settings last saved by the GUI are used.
+
+
+def select_camera_parameters(calibration_dir):
+    # Same as starting tracking from the GUI, the calibration of the config
+    # becomes the selected one. Otherwise the last selected one is kept.
+    cam_mtx_path = "{}/cam_mtx.npy".format(calibration_dir)
+    dist_path = "{}/dist.npy".format(calibration_dir)
+    if os.path.isfile(cam_mtx_path) and os.path.isfile(dist_path):
+        np.save(SELECTED_CAM_MTX_PATH, np.load(cam_mtx_path))
+        np.save(SELECTED_DIST_PATH, np.load(dist_path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless tracking")
+    parser.add_argument('--config', help="tracking config, a .pkl as saved by the GUI or a .json with the same keys")
+    parser.add_argument('--fast-replay', action='store_true',
+                        help="replay recorded sources as fast as tracking takes them instead of at their original timing")
+    parser.add_argument('--metrics-port', type=int,
+                        help="serve the tracking metrics as JSON on this local port, at /metrics")
+    args = parser.parse_args()
+
+    if args.config is not None:
+        tracking_config = TrackingCofig.from_file(args.config)
+    else:
+        tracking_config = TrackingCofig.persisted()
+    # There is no display to show video on.
+    tracking_config.show_video = False
+    if args.fast_replay:
+        tracking_config.replay_realtime = False
+    if args.metrics_port is not None:
+        tracking_config.metrics_port = args.metrics_port
+
+    select_camera_parameters(tracking_config.device_calibration_dir)
+
+    start_tracking = multiprocessing.Event()
+    stop_tracking = multiprocessing.Event()
+
+    headless_pid = os.getpid()
+
+    def stop(signal_number, stack_frame):
+        if os.getpid() != headless_pid:
+            # Forked tracking and publishing processes inherit this handler.
+            # They leave Ctrl+C to the scheduler, and still end on terminate.
+            if signal_number == signal.SIGTERM:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                os.kill(os.getpid(), signal.SIGTERM)
+            return
+
+        # The handler interrupts the main thread, possibly while it holds the
+        # event lock waiting on stop_tracking, setting it here would deadlock.
+        threading.Thread(target=stop_tracking.set).start()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    # A crashed tracking process or a lost camera fails the run, so
+    # supervisors restart it. Only a replayed recording reaching its end, or
+    # a stop, exits 0.
+    exit_code = TrackingScheduler(start_tracking, stop_tracking).run(tracking_config)
+
+    return 0 if exit_code == 0 else 1
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
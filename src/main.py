@@ -8,6 +8,7 @@ import requests
 import tkinter as tk
 from tkinter import LEFT, messagebox
 from tkinter import ttk
+from tkinter import filedialog
 import multiprocessing
 import time
 from tkinter.constants import ACTIVE, DISABLED
@@ -15,6 +16,8 @@ from PIL import ImageTk, Image
 import socket
 import numpy as np
 from tracking import TrackingScheduler, TrackingCofig
+from publishing import UDP_VIDEO_SINK
+from frame_recording import RECORDING_EXTENSION, is_recording
 from video_source_calibration import VideoSourceCalibration, VideoSourceCalibrationConfig
 from marker_detection_settings import CUBE_DETECTION, SINGLE_DETECTION, SingleMarkerDetectionSettings, MarkersCubeDetectionSettings, MarkerCubeMapping
 import video_device_listing
@@ -66,10 +69,21 @@ class App():
         self.video_source_frame.place(relx=0.5, rely=0.5, anchor='center')
         self.video_source_frame.grid_columnconfigure(1, weight=1)
 
+        self.video_source_buttons_frame = tk.Frame(
+            self.video_source_frame)
+        self.video_source_buttons_frame.grid(row=1, column=1, pady=5)
+
         self.refresh_video_sources_button = tk.Button(
-            self.video_source_frame, text="Refresh Devices")
+            self.video_source_buttons_frame, text="Refresh Devices")
         self.refresh_video_sources_button['command'] = self.refresh_video_sources
-        self.refresh_video_sources_button.grid(row=1, column=1, pady=5)
+        self.refresh_video_sources_button.grid(row=1, column=1, padx=5)
+
+        # Recordings made with frame_recorder.py are listed after the devices
+        # and replayed into calibration, cube mapping and tracking.
+        self.open_recording_button = tk.Button(
+            self.video_source_buttons_frame, text="Open Recording")
+        self.open_recording_button['command'] = self.open_recording
+        self.open_recording_button.grid(row=1, column=2, padx=5)
 
         self.video_source = ttk.Combobox(
             self.video_source_frame, state="readonly", height=4, width=40)
@@ -414,6 +428,12 @@ class App():
             self.export_video_input_frame, textvariable=self.video_server_port, width=7)
         self.video_server_port_entry.grid(row=1, column=4)
 
+        self.udp_video = tk.BooleanVar()
+        self.udp_video.set(UDP_VIDEO_SINK in self.tracking_config.enabled_sinks)
+        self.udp_video_checkbox = tk.Checkbutton(
+            self.export_video_input_frame, text="Send video", variable=self.udp_video)
+        self.udp_video_checkbox.grid(row=2, column=1)
+
         self.export_coordinates_websocket_frame = ttk.LabelFrame(
             self.publishing_config_frame, text="Coordinates Publish Server Web")
         self.export_coordinates_websocket_frame.grid(row=2, column=1, pady=5)
@@ -489,8 +509,12 @@ class App():
         self.cube_ids = []
         self.cube_ids_init()
         self.video_source_list = []
+        self.recording_paths = []
         self.refresh_video_sources()
-        self.video_source.current(self.tracking_config.device_number) #selects the last camera used by the AR Tracking
+        if is_recording(self.tracking_config.device_number):
+            self.add_recording(self.tracking_config.device_number)
+        else:
+            self.video_source.current(self.tracking_config.device_number) #selects the last camera used by the AR Tracking
         self.calibration_selection_init()
         self.icon_img = ImageTk.PhotoImage(Image.open("{}/error_icon.png".format(self.base_img_dir)))
     
@@ -621,7 +645,7 @@ class App():
 
     def marker_cube_map(self):
         try:
-            detection = MarkerCubeMapping(self.cube_id_selection.get(), self.calibration_selection.get(), self.video_source.current(),
+            detection = MarkerCubeMapping(self.cube_id_selection.get(), self.calibration_selection.get(), self.selected_video_source(),
                                         self.cube_markers_length.get(), self.cube_up_marker_id.get(),
                                         [self.cube_side_marker_1.get(), self.cube_side_marker_2.get(
                                         ), self.cube_side_marker_3.get(), self.cube_side_marker_4.get()],
@@ -642,6 +666,8 @@ class App():
                 self.cube_ids.remove("")
 
             self.cube_id_selection['values'] = sorted(self.cube_ids, key=str.lower)
+        except IOError as error:
+            tk.messagebox.showerror("Mapping Error", str(error))
         except tk.TclError:
             error_window = tk.Toplevel()
             error_window.title("Mapping Error")
@@ -695,11 +721,32 @@ class App():
     def refresh_video_sources(self):
         try:
             self.video_source_list = video_device_listing.get_devices()
-            self.video_source['values'] = self.video_source_list
+            self.video_source['values'] = self.video_source_list + [os.path.basename(path) for path in self.recording_paths]
             self.video_source.current(0)
         except SystemError:
             pass
 
+    def open_recording(self):
+        path = filedialog.askopenfilename(
+            title="Open Recording", filetypes=[("Frame recordings", "*{}".format(RECORDING_EXTENSION))])
+        if path:
+            self.add_recording(path)
+            self.refresh_calibrations()
+
+    def add_recording(self, path):
+        if path not in self.recording_paths:
+            self.recording_paths.append(path)
+        self.video_source['values'] = self.video_source_list + [os.path.basename(path) for path in self.recording_paths]
+        self.video_source.current(len(self.video_source_list) + self.recording_paths.index(path))
+
+    def selected_video_source(self):
+        # A device number, or the path of a recording listed after the devices.
+        index = self.video_source.current()
+        if index >= len(self.video_source_list):
+            return self.recording_paths[index - len(self.video_source_list)]
+
+        return index
+
     def start_tracking(self):
         try:
             self.save_tracking_config()
@@ -852,6 +899,9 @@ class App():
                     self.chessboard_square_size.set(calibration.to_dict().get('chessboard_square_size'))
                     self.score_text.set('Score: {:.2f}'.format(calibration.to_dict().get('score')))
             self.calibrate_button['state'] = DISABLED
+
+        # A running tracker reloads the selected calibration once these files change.
+        self.save_camera_parameters()
             
 
     def author_updated(self):
@@ -873,7 +923,7 @@ class App():
     def calibrate(self):
         try:    
             self.calibration = VideoSourceCalibration(
-                self.get_calibration_dir(), self.video_source.current(), self.chessboard_square_size.get())
+                self.get_calibration_dir(), self.selected_video_source(), self.chessboard_square_size.get())
 
             calibration_score = self.calibration.calibrate()
             self.save_calibration_config(calibration_score)
@@ -954,7 +1004,7 @@ class App():
     
     def test_calibration(self, event):
         self.calibration = VideoSourceCalibration(
-                self.get_calibration_dir(), self.video_source.current(), self.chessboard_square_size.get())
+                self.get_calibration_dir(), self.selected_video_source(), self.chessboard_square_size.get())
         self.save_camera_parameters()
         score = self.calibration.test()
         if score != -1:
@@ -1063,7 +1113,7 @@ class App():
         return '{}/{}'.format(self.base_video_source_dir, calibration_identification)
 
     def save_tracking_config(self):
-        self.tracking_config.device_number = self.video_source.current()
+        self.tracking_config.device_number = self.selected_video_source()
         self.tracking_config.device_calibration_dir = self.get_calibration_dir()
         self.tracking_config.calibration_number = self.calibration_selection.current()
         self.tracking_config.cube_number = self.cube_id_selection.current()
@@ -1079,6 +1129,10 @@ class App():
         self.tracking_config.video_server_ip = self.video_server_ip.get()
         int(self.video_server_port.get())
         self.tracking_config.video_server_port = self.video_server_port.get()
+        enabled_sinks = [sink for sink in self.tracking_config.enabled_sinks if sink != UDP_VIDEO_SINK]
+        if self.udp_video.get():
+            enabled_sinks.append(UDP_VIDEO_SINK)
+        self.tracking_config.enabled_sinks = enabled_sinks
         if self.websocket_server_ip.get() != "localhost":
             socket.inet_aton(self.websocket_server_ip.get())
         self.tracking_config.websocket_server_ip = self.websocket_server_ip.get()
@@ -0,0 +1,218 @@
+import json
+import math
+import time
+import numpy as np
+import cv2
+import cv2.aruco as aruco
+
+
+# Hand edited settings, keys left out keep their defaults.
+DETECTION_ENGINE_JSON_PATH = '../assets/configs/detection_engine.json'
+DETECTION_ENGINE_DEFAULTS = {
+    'dictionary': "DICT_6X6_250",
+    'adaptive_thresh_constant': 7,
+    'adaptive_thresh_win_size_min': 3,
+    'adaptive_thresh_win_size_max': 23,
+    'adaptive_thresh_win_size_step': 10,
+    'corner_refinement_method': "CORNER_REFINE_CONTOUR",
+    'roi_detection': False,
+    'roi_padding': 0.5,
+    'roi_max_misses': 5,
+    'detection_scale': 1.0}
+
+
+class DetectionEngineSettings:
+
+    def __init__(self, dictionary, adaptive_thresh_constant, adaptive_thresh_win_size_min,
+                 adaptive_thresh_win_size_max, adaptive_thresh_win_size_step, corner_refinement_method,
+                 roi_detection, roi_padding, roi_max_misses, detection_scale):
+        self.dictionary = dictionary
+        self.adaptive_thresh_constant = adaptive_thresh_constant
+        self.adaptive_thresh_win_size_min = adaptive_thresh_win_size_min
+        self.adaptive_thresh_win_size_max = adaptive_thresh_win_size_max
+        self.adaptive_thresh_win_size_step = adaptive_thresh_win_size_step
+        self.corner_refinement_method = corner_refinement_method
+        self.roi_detection = roi_detection
+        self.roi_padding = roi_padding
+        self.roi_max_misses = roi_max_misses
+        self.detection_scale = detection_scale
+
+    def to_data(self):
+        return {
+            'dictionary': self.dictionary,
+            'adaptive_thresh_constant': self.adaptive_thresh_constant,
+            'adaptive_thresh_win_size_min': self.adaptive_thresh_win_size_min,
+            'adaptive_thresh_win_size_max': self.adaptive_thresh_win_size_max,
+            'adaptive_thresh_win_size_step': self.adaptive_thresh_win_size_step,
+            'corner_refinement_method': self.corner_refinement_method,
+            'roi_detection': self.roi_detection,
+            'roi_padding': self.roi_padding,
+            'roi_max_misses': self.roi_max_misses,
+            'detection_scale': self.detection_scale}
+
+    @classmethod
+    def from_data(cls, settings):
+        settings = dict(DETECTION_ENGINE_DEFAULTS, **settings)
+        unknown_keys = set(settings) - set(DETECTION_ENGINE_DEFAULTS)
+        if unknown_keys:
+            raise ValueError("Unknown detection engine settings: {}".format(", ".join(sorted(unknown_keys))))
+
+        return cls(settings['dictionary'],
+                   settings['adaptive_thresh_constant'],
+                   settings['adaptive_thresh_win_size_min'],
+                   settings['adaptive_thresh_win_size_max'],
+                   settings['adaptive_thresh_win_size_step'],
+                   settings['corner_refinement_method'],
+                   settings['roi_detection'],
+                   settings['roi_padding'],
+                   settings['roi_max_misses'],
+                   settings['detection_scale'])
+
+    @classmethod
+    def persisted(cls):
+        try:
+            with open(DETECTION_ENGINE_JSON_PATH, 'r') as file:
+                return cls.from_data(json.load(file))
+
+        except FileNotFoundError:
+            return cls.from_data({})
+
+
+class MarkerDetectionEngine:
+
+    def __init__(self, settings):
+        self.__dictionary = aruco.Dictionary_get(
+            getattr(aruco, settings.dictionary))
+
+        self.__parameters = aruco.DetectorParameters_create()
+        self.__parameters.adaptiveThreshConstant = settings.adaptive_thresh_constant
+        self.__parameters.adaptiveThreshWinSizeMin = settings.adaptive_thresh_win_size_min
+        self.__parameters.adaptiveThreshWinSizeMax = settings.adaptive_thresh_win_size_max
+        self.__parameters.adaptiveThreshWinSizeStep = settings.adaptive_thresh_win_size_step
+        self.__parameters.cornerRefinementMethod = getattr(
+            aruco, settings.corner_refinement_method)
+
+        self.__scale = float(settings.detection_scale)
+        # Corners found on the downscaled image are off by up to about one
+        # downscaled pixel, the refinement window has to cover that at full size.
+        refinement_window = max(2, int(math.ceil(1.5 / self.__scale)))
+        self.__refinement_window = (refinement_window, refinement_window)
+        self.__refinement_criteria = (cv2.TERM_CRITERIA_EPS +
+                                      cv2.TERM_CRITERIA_MAX_ITER, 30, 0.01)
+
+        self.__gray_buffer = None
+        self.__grayscale_time = 0.0
+
+    @classmethod
+    def persisted(cls):
+        return cls(DetectionEngineSettings.persisted())
+
+    @property
+    def scale(self):
+        return self.__scale
+
+    @property
+    def grayscale_time(self):
+        # Seconds the last detect spent converting to grayscale.
+        return self.__grayscale_time
+
+    def grayscale(self, frame):
+        # The returned image is overwritten by the next call, copy it to keep it.
+        height, width = frame.shape[:2]
+        if self.__gray_buffer is None or self.__gray_buffer.size < height * width:
+            self.__gray_buffer = np.empty(height * width, dtype=np.uint8)
+
+        gray = self.__gray_buffer[:height * width].reshape(height, width)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+
+        return gray
+
+    def detect(self, frame, region=None):
+        if region is None:
+            x, y = 0, 0
+        else:
+            x, y, width, height = region
+            frame = frame[y:y + height, x:x + width]
+
+        start = time.perf_counter()
+        gray = self.grayscale(frame)
+        self.__grayscale_time = time.perf_counter() - start
+        if self.__scale < 1.0:
+            corners, ids = self.__pyramid_detect(gray)
+        else:
+            corners, ids, _ = aruco.detectMarkers(
+                gray, self.__dictionary, parameters=self.__parameters)
+
+        if x != 0 or y != 0:
+            offset = np.array([x, y], dtype=np.float32)
+            for marker_corners in corners:
+                marker_corners += offset
+
+        return corners, ids
+
+    def __pyramid_detect(self, gray):
+        small_gray = cv2.resize(gray, None, fx=self.__scale, fy=self.__scale,
+                                interpolation=cv2.INTER_AREA)
+        corners, ids, _ = aruco.detectMarkers(
+            small_gray, self.__dictionary, parameters=self.__parameters)
+
+        if len(corners) == 0:
+            return corners, ids
+
+        # Refines every corner in a single call at native resolution. Pixel
+        # centers sit half a pixel in, at both resolutions.
+        stacked_corners = (np.concatenate(corners).reshape(-1, 1, 2) + 0.5) / self.__scale - 0.5
+        stacked_corners = cv2.cornerSubPix(
+            gray, stacked_corners.astype(np.float32), self.__refinement_window, (-1, -1),
+            self.__refinement_criteria)
+
+        return tuple(marker_corners.reshape(1, 4, 2) for marker_corners in
+                     np.split(stacked_corners, len(corners))), ids
+
+
+class PredictedDetectionRegion:
+
+    def __init__(self, object_points, padding, max_misses):
+        self.__object_points = object_points
+        self.__padding = padding
+        self.__max_misses = max_misses
+        self.__region = None
+        self.__misses = 0
+
+    def region(self):
+        return self.__region
+
+    def predicted(self, rot_mtx, tvec, cam_mtx, dist, frame_shape):
+        if tvec[2] <= 0:
+            self.__region = None
+            return
+
+        rvec, _ = cv2.Rodrigues(rot_mtx)
+        image_points, _ = cv2.projectPoints(
+            self.__object_points, rvec, np.array(tvec, dtype=np.float64), cam_mtx, dist)
+        x, y, width, height = cv2.boundingRect(image_points.astype(np.float32))
+
+        pad_x = int(width * self.__padding)
+        pad_y = int(height * self.__padding)
+        frame_height, frame_width = frame_shape[:2]
+        x0 = max(x - pad_x, 0)
+        y0 = max(y - pad_y, 0)
+        x1 = min(x + width + pad_x, frame_width)
+        y1 = min(y + height + pad_y, frame_height)
+
+        if x1 - x0 < 8 or y1 - y0 < 8:
+            self.__region = None
+        else:
+            self.__region = (x0, y0, x1 - x0, y1 - y0)
+
+        self.__misses = 0
+
+    def missed(self):
+        # Keeps looking around the last prediction, then goes back to full frame.
+        if self.__region is None:
+            return
+
+        self.__misses += 1
+        if self.__misses >= self.__max_misses:
+            self.__region = None
+            self.__misses = 0
@@ -8,6 +8,9 @@ import statistics
 import cv2
 import numpy as np
 import cv2.aruco as aruco
+from marker_detection import MarkerDetectionEngine
+from frame_capture import open_video_capture
+from frame_recording import is_recording
 
 CUBE_DETECTION = "MARKERS CUBE"
 SINGLE_DETECTION = "SINGLE MARKER"
@@ -105,8 +108,11 @@ class MarkerCubeMapping:
 
         self.__acquire_min_count = 100
         self.__database_calibrations = database_calibrations
+        self.__detection_engine = None
 
     def map(self):
+        self.__detection_engine = MarkerDetectionEngine.persisted()
+
         side_up_transformations = {}
         if self.__down_marker_id != "":
             down_side_transformations = {}
@@ -137,13 +143,24 @@ class MarkerCubeMapping:
 
         #Descomentar quando nao for utilizar o DroidCam
         #video_capture = cv2.VideoCapture(self.__video_source, cv2.CAP_DSHOW)
-        video_capture = cv2.VideoCapture(self.__video_source)
+        video_capture = open_video_capture(self.__video_source)
+        if not video_capture.isOpened():
+            cv2.destroyAllWindows()
+            raise IOError("Could not open video source {}".format(self.__video_source))
 
         video_capture.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
         video_capture.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
 
         while True:
-            _, frame = video_capture.read()
+            captured, frame = video_capture.read()
+            if not captured:
+                video_capture.release()
+                cv2.destroyAllWindows()
+                if not is_recording(self.__video_source):
+                    raise IOError("Video source {} was lost".format(self.__video_source))
+
+                # A replayed recording ended.
+                break
 
             done = True
             for side_marker_id in self.__side_marker_ids:
@@ -259,14 +276,7 @@ class MarkerCubeMapping:
                 break
 
     def __detect_markers(self, frame):
-        parameters = aruco.DetectorParameters_create()
-        parameters.adaptiveThreshConstant = 7
-        parameters.cornerRefinementMethod = aruco.CORNER_REFINE_CONTOUR
-
-        corners, ids, _ = aruco.detectMarkers(
-            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY),
-            aruco.Dictionary_get(aruco.DICT_6X6_250),
-            parameters=parameters)
+        corners, ids = self.__detection_engine.detect(frame)
 
         aruco.drawDetectedMarkers(frame, corners)
 
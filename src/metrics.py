@@ -0,0 +1,109 @@
+import json
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+# Durations kept per timer, percentiles are over the latest ones only.
+TIMING_WINDOW = 300
+TIMING_PERCENTILES = (50, 95, 99)
+
+
+class TrackingMetrics:
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__gauges = {}
+        self.__counters = {}
+        self.__timings = {}
+
+    def set_gauge(self, name, value):
+        with self.__lock:
+            self.__gauges[name] = value
+
+    def increment(self, name, amount=1):
+        with self.__lock:
+            self.__counters[name] = self.__counters.get(name, 0) + amount
+
+    def observe(self, name, seconds):
+        with self.__lock:
+            if name not in self.__timings:
+                self.__timings[name] = deque(maxlen=TIMING_WINDOW)
+            self.__timings[name].append(seconds)
+
+    def gauges(self):
+        with self.__lock:
+            return dict(self.__gauges)
+
+    def snapshot(self):
+        with self.__lock:
+            gauges = dict(self.__gauges)
+            counters = dict(self.__counters)
+            timings = {name: list(durations) for name, durations in self.__timings.items()}
+
+        # Percentiles in milliseconds, computed outside the lock so scrapes
+        # never hold up the tracking loop.
+        return {
+            'gauges': gauges,
+            'counters': counters,
+            'timings': {name: timing_summary(durations) for name, durations in timings.items()}}
+
+
+class MetricsServer:
+
+    def __init__(self, metrics, host='127.0.0.1', port=0):
+        # Serves the metrics snapshot as JSON on GET /metrics, for scraping
+        # while tracking runs.
+        self.__metrics = metrics
+        self.__host = host
+        self.__port = port
+        self.__server = None
+        self.__thread = None
+
+    def start(self):
+        metrics = self.__metrics
+
+        class MetricsRequestHandler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.rstrip('/') not in ('', '/metrics'):
+                    self.send_error(404)
+                    return
+
+                body = json.dumps(metrics.snapshot()).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.__server = ThreadingHTTPServer((self.__host, self.__port), MetricsRequestHandler)
+        self.__server.daemon_threads = True
+        self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+        self.__thread.start()
+
+        return self
+
+    @property
+    def port(self):
+        return self.__server.server_address[1]
+
+    def stop(self):
+        if self.__server is not None:
+            self.__server.shutdown()
+            self.__server.server_close()
+            self.__server = None
+            self.__thread.join()
+
+
+def timing_summary(durations):
+    summary = {'samples': len(durations)}
+    if durations:
+        percentiles = np.percentile(durations, TIMING_PERCENTILES) * 1000
+        for percentile, value in zip(TIMING_PERCENTILES, percentiles):
+            summary['p{}'.format(percentile)] = float(value)
+
+    return summary
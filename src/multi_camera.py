@@ -0,0 +1,247 @@
+from multiprocessing import Process, Queue, parent_process
+from collections import deque
+import queue
+import time
+import numpy as np
+import cv2
+import cv2.aruco as aruco
+from frame_capture import open_frame_capture
+from frame_recording import replay_start
+from pose_estimation import MarkerPoseEstimator
+from video_source_calibration import CalibrationStore
+from rotations import rotation_matrix_to_quaternion, quaternion_to_rotation_matrix, average_quaternions
+
+# Measurements captured further apart than this are not fused into the same pose.
+FUSION_WINDOW = 0.03
+# Seconds a measurement waits for the other cameras before it is fused
+# without the ones that did not report, in case a camera stalls.
+FUSION_TIMEOUT = 0.1
+
+
+class CameraSettings:
+
+    def __init__(self, device_number, calibration_dir, extrinsic):
+        self.device_number = device_number
+        self.calibration_dir = calibration_dir
+        # Camera to world transformation.
+        self.extrinsic = extrinsic
+
+
+class MultiCameraDetection:
+
+    def __init__(self, cameras, frame_width, frame_height, targets, detection_engine_settings, translation_offset, frame_ring, fusion_window=FUSION_WINDOW, replay_realtime=True, fusion_timeout=FUSION_TIMEOUT):
+        self.__measurements = Queue()
+        # Recordings replayed in realtime keep the time between their frames
+        # and the other cameras' frames.
+        start = replay_start([camera_settings.device_number for camera_settings in cameras]) if replay_realtime else None
+        # Only the first camera feeds the published video.
+        self.__processes = [Process(target=CameraWorker(
+            camera_index=camera_index,
+            camera_settings=camera_settings,
+            frame_width=frame_width,
+            frame_height=frame_height,
+            targets=targets,
+            detection_engine_settings=detection_engine_settings,
+            translation_offset=translation_offset,
+            measurements=self.__measurements,
+            frame_ring=frame_ring if camera_index == 0 else None,
+            replay_realtime=replay_realtime,
+            replay_start=start).run, daemon=True)
+            for camera_index, camera_settings in enumerate(cameras)]
+        self.__fusion = PoseFusion(len(cameras), fusion_window, fusion_timeout)
+        self.__stage_times = {}
+        self.__dropped_frames = [0] * len(cameras)
+        self.__lost = False
+
+    def start(self, frame_capture=None, region=None):
+        # Every camera captures in its own worker, there is no shared capture
+        # nor a detection region to follow.
+        for process in self.__processes:
+            process.start()
+
+        return self
+
+    def next_result(self):
+        while True:
+            if self.__lost or any(process.exitcode not in (None, 0) for process in self.__processes):
+                # A camera that failed to open or was lost ends tracking.
+                self.__lost = True
+                return None
+
+            fused = self.__fusion.fuse()
+            if fused is not None:
+                return self.__result(fused)
+            if self.__fusion.finished():
+                return None
+
+            deadline = self.__fusion.deadline()
+            timeout = 1.0 if deadline is None else max(0.0, deadline - time.time())
+
+            try:
+                camera_index, capture_timestamp, poses, stage_times, dropped_frames, lost = self.__measurements.get(timeout=timeout)
+            except queue.Empty:
+                if not any(process.is_alive() for process in self.__processes):
+                    for camera_index in range(len(self.__processes)):
+                        self.__fusion.end_camera(camera_index)
+                continue
+
+            self.__dropped_frames[camera_index] = dropped_frames
+            if capture_timestamp is None:
+                # That camera's stream ended.
+                self.__lost |= lost
+                self.__fusion.end_camera(camera_index)
+                continue
+
+            self.__stage_times = stage_times
+            self.__fusion.add(camera_index, capture_timestamp, poses)
+
+    def stage_times(self):
+        # Stages of the latest camera measurement.
+        return self.__stage_times
+
+    def dropped_frames(self):
+        return sum(self.__dropped_frames)
+
+    def lost(self):
+        return self.__lost
+
+    def stop(self):
+        for process in self.__processes:
+            process.terminate()
+            process.join(1.0)
+
+    def __result(self, fused):
+        capture_timestamp, fused_poses = fused
+        poses = {}
+        for target_id, pose in fused_poses.items():
+            rvec, _ = cv2.Rodrigues(pose[:3, :3])
+            poses[target_id] = (rvec, pose[:3, 3].copy())
+
+        return None, capture_timestamp, ((), None, poses)
+
+
+class PoseFusion:
+
+    def __init__(self, cameras, fusion_window, fusion_timeout=FUSION_TIMEOUT):
+        # Measurements are matched on their capture timestamps, not on when
+        # they arrive, so cameras running at different speeds, or replayed as
+        # fast as they go, still fuse the frames of the same instant.
+        self.__fusion_window = fusion_window
+        self.__fusion_timeout = fusion_timeout
+        # Camera index to its (capture timestamp, poses, arrival time) not fused yet.
+        self.__pending = {camera_index: deque() for camera_index in range(cameras)}
+        self.__ended = set()
+        self.__fused_timestamp = None
+
+    def add(self, camera_index, capture_timestamp, poses):
+        if self.__fused_timestamp is not None and capture_timestamp <= self.__fused_timestamp:
+            # Its instant was already fused without it.
+            return
+
+        self.__pending[camera_index].append((capture_timestamp, poses, time.time()))
+
+    def end_camera(self, camera_index):
+        self.__ended.add(camera_index)
+
+    def finished(self):
+        return len(self.__ended) == len(self.__pending) and not any(self.__pending.values())
+
+    def deadline(self):
+        arrivals = [measurements[0][2] for measurements in self.__pending.values() if measurements]
+        if not arrivals:
+            return None
+
+        return min(arrivals) + self.__fusion_timeout
+
+    def fuse(self):
+        # The earliest instant, once every camera still running reported it
+        # or a later one, or once it waited for them long enough.
+        heads = {camera_index: measurements[0] for camera_index, measurements in self.__pending.items() if measurements}
+        if not heads:
+            return None
+
+        waiting = [camera_index for camera_index in self.__pending
+                   if camera_index not in heads and camera_index not in self.__ended]
+        if waiting and time.time() < self.deadline():
+            return None
+
+        group_timestamp = min(capture_timestamp for capture_timestamp, _, _ in heads.values())
+        group = [self.__pending[camera_index].popleft() for camera_index, (capture_timestamp, _, _) in heads.items()
+                 if capture_timestamp - group_timestamp <= self.__fusion_window]
+
+        capture_timestamp = max(capture_timestamp for capture_timestamp, _, _ in group)
+        self.__fused_timestamp = capture_timestamp
+        target_poses = {}
+        for _, poses, _ in group:
+            for target_id, pose in poses.items():
+                target_poses.setdefault(target_id, []).append(pose)
+
+        fused_poses = {}
+        for target_id, poses in target_poses.items():
+            fused_pose = np.eye(4)
+            fused_pose[:3, 3] = np.mean([pose[:3, 3] for pose in poses], axis=0)
+            fused_pose[:3, :3] = quaternion_to_rotation_matrix(average_quaternions(
+                [rotation_matrix_to_quaternion(pose[:3, :3]) for pose in poses]))
+            fused_poses[target_id] = fused_pose
+
+        return capture_timestamp, fused_poses
+
+
+class CameraWorker:
+
+    def __init__(self, camera_index, camera_settings, frame_width, frame_height, targets, detection_engine_settings, translation_offset, measurements, frame_ring, replay_realtime=True, replay_start=None):
+        self.__camera_index = camera_index
+        self.__camera_settings = camera_settings
+        self.__frame_width = frame_width
+        self.__frame_height = frame_height
+        self.__targets = targets
+        self.__detection_engine_settings = detection_engine_settings
+        self.__translation_offset = translation_offset
+        self.__measurements = measurements
+        self.__frame_ring = frame_ring
+        self.__replay_realtime = replay_realtime
+        self.__replay_start = replay_start
+
+    def run(self):
+        calibration_store = CalibrationStore(
+            '{}/cam_mtx.npy'.format(self.__camera_settings.calibration_dir),
+            '{}/dist.npy'.format(self.__camera_settings.calibration_dir))
+        estimator = MarkerPoseEstimator(
+            self.__targets, self.__detection_engine_settings, self.__translation_offset, calibration_store)
+        frame_capture = open_frame_capture(
+            self.__camera_settings.device_number, self.__frame_width, self.__frame_height, self.__replay_realtime,
+            self.__replay_start).start()
+
+        # The tracker may have been terminated without stopping the cameras.
+        while parent_process().is_alive():
+            start = time.perf_counter()
+            captured, frame, capture_timestamp = frame_capture.read()
+            capture_time = time.perf_counter() - start
+            if not captured:
+                break
+
+            corners, _, poses = estimator.estimate(frame)
+
+            # Only the targets found by this camera are sent.
+            world_poses = {}
+            for target_id, (rvec, tvec) in poses.items():
+                if rvec is not None and tvec is not None:
+                    camera_pose = np.eye(4)
+                    camera_pose[:3, :3], _ = cv2.Rodrigues(rvec)
+                    camera_pose[:3, 3] = np.ravel(tvec)
+                    world_poses[target_id] = np.dot(self.__camera_settings.extrinsic, camera_pose)
+
+            self.__measurements.put((self.__camera_index, capture_timestamp, world_poses,
+                                     dict(estimator.stage_times, capture=capture_time), frame_capture.dropped_frames, False))
+
+            # Video is only drawn while someone reads the ring.
+            if self.__frame_ring is not None and self.__frame_ring.subscribers() > 0:
+                aruco.drawDetectedMarkers(frame, corners)
+                cam_mtx, dist = estimator.camera_parameters()
+                for target_id, (rvec, tvec) in poses.items():
+                    if target_id in world_poses:
+                        aruco.drawAxis(frame, cam_mtx, dist, rvec, tvec, 5)
+                self.__frame_ring.write(frame, capture_timestamp)
+
+        self.__measurements.put((self.__camera_index, None, None, {}, frame_capture.dropped_frames, frame_capture.lost()))
+        frame_capture.release()
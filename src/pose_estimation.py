@@ -0,0 +1,161 @@
+import time
+import numpy as np
+import cv2
+import cv2.aruco as aruco
+from marker_detection_settings import SINGLE_DETECTION, CUBE_DETECTION
+from marker_detection import MarkerDetectionEngine
+from video_source_calibration import CalibrationStore
+
+
+class MarkerPoseEstimator:
+
+    def __init__(self, targets, detection_engine_settings, translation_offset, calibration_store=None):
+        # Target id to the marker or cube detection settings resolved on every frame.
+        self.__targets = targets
+        self.__detection_engine = MarkerDetectionEngine(detection_engine_settings)
+        if calibration_store is None:
+            calibration_store = CalibrationStore()
+        self.__calibration_store = calibration_store
+        self.__translation_offset = translation_offset
+        self.__cubes_points = {}
+        self.__stage_times = {}
+
+    def estimate(self, frame, region=None):
+        # Only reads the frame, so it can run on frames shared with other processes.
+        # One detection pass serves every target.
+        start = time.perf_counter()
+        corners, ids = self.__detection_engine.detect(frame, region)
+        detected = time.perf_counter()
+        cam_mtx, dist = self.__calibration_store.camera_parameters()
+
+        poses = {}
+        for target_id, marker_detection_settings in self.__targets.items():
+            if marker_detection_settings.identifier == SINGLE_DETECTION:
+                poses[target_id] = self.__single_marker_pose(
+                    marker_detection_settings, corners, ids, cam_mtx, dist)
+            elif marker_detection_settings.identifier == CUBE_DETECTION:
+                poses[target_id] = self.__markers_cube_pose(
+                    target_id, marker_detection_settings, corners, ids, cam_mtx, dist)
+            else:
+                raise Exception("Invalid detection identifier. Received: {}".format(
+                    marker_detection_settings.identifier))
+
+        grayscale_time = self.__detection_engine.grayscale_time
+        self.__stage_times = {
+            'grayscale': grayscale_time,
+            'detection': detected - start - grayscale_time,
+            'estimation': time.perf_counter() - detected}
+
+        return corners, ids, poses
+
+    def camera_parameters(self):
+        return self.__calibration_store.camera_parameters()
+
+    @property
+    def stage_times(self):
+        # Seconds spent on each stage of the last estimate.
+        return self.__stage_times
+
+    def __single_marker_pose(self, marker_detection_settings, corners, ids, cam_mtx, dist):
+        marker_rvec = None
+        marker_tvec = None
+        if np.all(ids is not None) and cam_mtx is not None:
+            marker_index = None
+
+            for i in range(0, ids.size):
+                if ids[i][0] == marker_detection_settings.marker_id:
+                    marker_index = i
+                    break
+
+            if marker_index is not None:
+                rvecs, tvecs, _ = aruco.estimatePoseSingleMarkers(
+                    [corners[marker_index]], float(marker_detection_settings.marker_length), cam_mtx, dist)
+
+                marker_position = self.__get_position_matrix(rvecs[0], tvecs[0])
+
+                marker_position = self.__apply_transformation(
+                    marker_position, self.__translation_offset)
+
+                marker_rvec, marker_tvec = self.__get_rvec_and_tvec(
+                    marker_position)
+
+        return marker_rvec, marker_tvec
+
+    def __markers_cube_pose(self, target_id, marker_detection_settings, corners, ids, cam_mtx, dist):
+        main_marker_rvec = None
+        main_marker_tvec = None
+        if np.all(ids is not None) and cam_mtx is not None:
+            cube_points = self.__cube_points(target_id, marker_detection_settings)
+            # Markers of other targets share the frame, only this cube's faces count.
+            cube_indexes = [i for i in range(0, ids.size) if ids[i][0] in cube_points]
+
+            if cube_indexes:
+                # The largest face seeds the solve, all visible faces refine it together.
+                seed_index = max(cube_indexes, key=lambda i: cv2.contourArea(corners[i].reshape(4, 2)))
+                seed_marker_id = ids[seed_index][0]
+                rvecs, tvecs, _ = aruco.estimatePoseSingleMarkers(
+                    [corners[seed_index]], float(marker_detection_settings.markers_length), cam_mtx, dist)
+
+                cube_position = self.__get_position_matrix(rvecs[0], tvecs[0])
+                if seed_marker_id != marker_detection_settings.up_marker_id:
+                    cube_position = self.__apply_transformation(
+                        cube_position, marker_detection_settings.transformations[seed_marker_id])
+
+                if len(cube_indexes) > 1:
+                    object_points = np.concatenate([cube_points[ids[i][0]] for i in cube_indexes])
+                    image_points = np.concatenate([corners[i].reshape(4, 2) for i in cube_indexes])
+                    rvec, tvec = self.__get_rvec_and_tvec(cube_position)
+                    solved, rvec, tvec = cv2.solvePnP(
+                        object_points, image_points.astype(np.float64), cam_mtx, dist,
+                        rvec.reshape(3, 1), tvec.reshape(3, 1), True, cv2.SOLVEPNP_ITERATIVE)
+                    if solved:
+                        cube_position = self.__get_position_matrix(rvec, tvec.T)
+
+                cube_position = self.__apply_transformation(
+                    cube_position, self.__translation_offset)
+
+                main_marker_rvec, main_marker_tvec = self.__get_rvec_and_tvec(
+                    cube_position)
+
+        return main_marker_rvec, main_marker_tvec
+
+    def __cube_points(self, target_id, marker_detection_settings):
+        # Corners of every face in the up marker frame, in the aruco corner order.
+        if target_id not in self.__cubes_points:
+            half_length = float(marker_detection_settings.markers_length) / 2
+            marker_points = np.array([[-half_length, half_length, 0, 1], [half_length, half_length, 0, 1],
+                                      [half_length, -half_length, 0, 1], [-half_length, -half_length, 0, 1]])
+
+            cube_points = {marker_detection_settings.up_marker_id: marker_points[:, :3].copy()}
+            for marker_id, transformation in marker_detection_settings.transformations.items():
+                cube_points[marker_id] = np.dot(np.linalg.inv(transformation), marker_points.T).T[:, :3].copy()
+            self.__cubes_points[target_id] = cube_points
+
+        return self.__cubes_points[target_id]
+
+    def __get_position_matrix(self, rvec, tvec):
+        rot_mtx = np.zeros(shape=(3, 3))
+        cv2.Rodrigues(rvec, rot_mtx)
+
+        position = np.concatenate(
+            (rot_mtx, np.transpose(tvec)), axis=1)
+        position = np.concatenate(
+            (position, np.array([[0, 0, 0, 1]])))
+
+        return position
+
+    def __get_rvec_and_tvec(self, position_matrix):
+
+        tvec_t = np.delete(position_matrix[:, 3], (3))
+
+        position_matrix = np.delete(
+            position_matrix, 3, 0)
+        position_matrix = np.delete(
+            position_matrix, 3, 1)
+
+        rvec_t, _ = cv2.Rodrigues(position_matrix)
+
+        return rvec_t.T, tvec_t.T
+
+    def __apply_transformation(self, position_matrix, transformation):
+        return np.dot(position_matrix, transformation)
@@ -0,0 +1,135 @@
+import numpy as np
+from rotations import rotation_matrix_to_quaternion, quaternion_to_rotation_matrix, quaternion_multiply, \
+    quaternion_conjugate, quaternion_to_rotation_vector, rotation_vector_to_quaternion
+
+OPENCV_KALMAN_FILTER = "OPENCV_KALMAN"
+CONSTANT_ACCELERATION_FILTER = "CONSTANT_ACCELERATION"
+QUATERNION_FILTER = "QUATERNION"
+
+# Bounds for the measured time between frames, a long detection gap must not
+# extrapolate the acceleration over seconds.
+MIN_DELTA_TIME = 0.001
+MAX_DELTA_TIME = 0.25
+
+
+class ConstantAccelerationFilter:
+
+    def __init__(self, delta_time, process_noise=1e-5, measurement_noise=1e-4):
+        # Same model as create_kalman_filter, translation and euler angles
+        # are six independent [position, velocity, acceleration] chains. They
+        # share the transition, noises and initial covariance, so one 3x3
+        # covariance and gain serve every chain, kept as plain floats since
+        # NumPy call overhead dominates at this size.
+        self.__state = np.zeros((18, 1))
+        # [translation or rotation block, derivative, axis] view of the state,
+        # matching the cv2.KalmanFilter layout used by create_kalman_filter.
+        self.__chains = self.__state.reshape(2, 3, 3)
+        self.__covariance = [1.0, 0.0, 0.0, 1.0, 0.0, 1.0]
+        self.__process_noise = process_noise
+        self.__measurement_noise = measurement_noise
+        self.__delta_time = None
+        self.__transition = None
+        self.__last_timestamp = None
+        self.__set_delta_time(delta_time)
+
+    @property
+    def statePost(self):
+        return self.__state
+
+    @property
+    def transitionMatrix(self):
+        transition = np.zeros((18, 18))
+        for block in (0, 9):
+            transition[block:block + 9, block:block + 9] = np.kron(self.__transition, np.eye(3))
+
+        return transition
+
+    def predict(self, timestamp=None):
+        # Given the capture timestamp, steps by the real time since the last
+        # prediction instead of the configured delta time.
+        if timestamp is not None:
+            if self.__last_timestamp is not None:
+                self.__set_delta_time(min(max(timestamp - self.__last_timestamp, MIN_DELTA_TIME), MAX_DELTA_TIME))
+            self.__last_timestamp = timestamp
+
+        self.__chains[:] = np.matmul(self.__transition, self.__chains)
+
+        # F * P * F^T + Q with F = [[1, dt, dt^2 / 2], [0, 1, dt], [0, 0, 1]].
+        dt = self.__delta_time
+        half_dt2 = 0.5 * dt * dt
+        p00, p01, p02, p11, p12, p22 = self.__covariance
+        r00 = p00 + dt * p01 + half_dt2 * p02
+        r01 = p01 + dt * p11 + half_dt2 * p12
+        r02 = p02 + dt * p12 + half_dt2 * p22
+        r11 = p11 + dt * p12
+        r12 = p12 + dt * p22
+        self.__covariance = [r00 + dt * r01 + half_dt2 * r02 + self.__process_noise,
+                             r01 + dt * r02,
+                             r02,
+                             r11 + dt * r12 + self.__process_noise,
+                             r12,
+                             p22 + self.__process_noise]
+
+        return self.__state
+
+    def correct(self, measurements):
+        # Positions are measured directly, so the gain is the first covariance
+        # column scaled by the innovation variance.
+        p00, p01, p02, p11, p12, p22 = self.__covariance
+        innovation_variance = p00 + self.__measurement_noise
+        k0 = p00 / innovation_variance
+        k1 = p01 / innovation_variance
+        k2 = p02 / innovation_variance
+
+        innovation = np.reshape(measurements, (2, 1, 3)) - self.__chains[:, 0:1, :]
+        self.__chains += np.array([[[k0], [k1], [k2]]]) * innovation
+
+        self.__covariance = [p00 - k0 * p00, p01 - k0 * p01, p02 - k0 * p02,
+                             p11 - k1 * p01, p12 - k1 * p02, p22 - k2 * p02]
+
+        return self.__state
+
+    def __set_delta_time(self, delta_time):
+        if delta_time == self.__delta_time:
+            return
+
+        self.__delta_time = delta_time
+        self.__transition = np.array([[1.0, delta_time, 0.5 * delta_time ** 2],
+                                      [0.0, 1.0, delta_time],
+                                      [0.0, 0.0, 1.0]])
+
+
+class QuaternionPoseFilter:
+
+    def __init__(self, delta_time):
+        # Translation chains as in ConstantAccelerationFilter. The rotation
+        # chains hold a small local rotation vector away from the filtered
+        # orientation quaternion, folded back into it after every correction,
+        # so orientations never go through euler angles nor wrap around.
+        self.__filter = ConstantAccelerationFilter(delta_time)
+        self.__orientation = None
+
+    @property
+    def statePost(self):
+        return self.__filter.statePost
+
+    @property
+    def transitionMatrix(self):
+        return self.__filter.transitionMatrix
+
+    def update(self, translation, rot_mtx, timestamp=None):
+        quaternion = rotation_matrix_to_quaternion(rot_mtx)
+        if self.__orientation is None:
+            self.__orientation = quaternion
+
+        self.__filter.predict(timestamp)
+
+        rotation_error = quaternion_to_rotation_vector(
+            quaternion_multiply(quaternion_conjugate(self.__orientation), quaternion))
+        state = self.__filter.correct(np.concatenate((translation, rotation_error)))
+
+        self.__orientation = quaternion_multiply(
+            self.__orientation, rotation_vector_to_quaternion(state[9:12, 0]))
+        state[9:12] = 0
+
+        return state[0:3, 0], quaternion_to_rotation_matrix(self.__orientation)
@@ -0,0 +1,68 @@
+import struct
+
+JSON_DATA_FORMAT = "JSON"
+BINARY_DATA_FORMAT = "BINARY"
+
+POSE_PACKET_MAGIC = b'POSE'
+POSE_PACKET_VERSION = 1
+
+# Little endian. Header: magic, version, target count, sequence number,
+# capture timestamp, publish timestamp.
+HEADER = struct.Struct('<4sHHQdd')
+# Per target, in the configured targets order: target index, status flags,
+# translation x y z, then the rotation right, up and forward axes.
+TARGET = struct.Struct('<HH12d')
+
+SUCCESS_FLAG = 0x1
+
+ROTATION_KEYS = ('rotation_right_x', 'rotation_right_y', 'rotation_right_z',
+                 'rotation_up_x', 'rotation_up_y', 'rotation_up_z',
+                 'rotation_forward_x', 'rotation_forward_y', 'rotation_forward_z')
+POSE_KEYS = ('translation_x', 'translation_y', 'translation_z') + ROTATION_KEYS
+EMPTY_POSE = (0.0,) * len(POSE_KEYS)
+
+
+class PosePacketEncoder:
+
+    def __init__(self, targets_count):
+        self.__buffer = bytearray(HEADER.size + targets_count * TARGET.size)
+
+    def encode(self, sequence, capture_timestamp, timestamp, detection_results):
+        # detection_results are the per target result dicts, in target order.
+        HEADER.pack_into(self.__buffer, 0, POSE_PACKET_MAGIC, POSE_PACKET_VERSION,
+                         len(detection_results), sequence, capture_timestamp, timestamp)
+
+        offset = HEADER.size
+        for target_index, detection_result in enumerate(detection_results):
+            if detection_result['success']:
+                TARGET.pack_into(self.__buffer, offset, target_index, SUCCESS_FLAG,
+                                 *(detection_result[key] for key in POSE_KEYS))
+            else:
+                TARGET.pack_into(self.__buffer, offset, target_index, 0, *EMPTY_POSE)
+            offset += TARGET.size
+
+        return bytes(self.__buffer)
+
+
+def is_pose_packet(data):
+    return len(data) >= HEADER.size and data[:4] == POSE_PACKET_MAGIC
+
+
+def decode_pose_packet(data):
+    # Reference decoder, gives back the same keys as the JSON payload.
+    magic, version, targets_count, sequence, capture_timestamp, timestamp = HEADER.unpack_from(data, 0)
+    if magic != POSE_PACKET_MAGIC or version != POSE_PACKET_VERSION:
+        raise ValueError("Not a version {} pose packet".format(POSE_PACKET_VERSION))
+
+    targets = []
+    for target_index, flags, *pose in TARGET.iter_unpack(data[HEADER.size:HEADER.size + targets_count * TARGET.size]):
+        target = {'target_index': target_index, 'success': bool(flags & SUCCESS_FLAG)}
+        if target['success']:
+            target.update(zip(POSE_KEYS, pose))
+        targets.append(target)
+
+    return {
+        'sequence': sequence,
+        'timestamp': timestamp,
+        'capture_timestamp': capture_timestamp,
+        'targets': targets}
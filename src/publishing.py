@@ -0,0 +1,378 @@
+import socket
+import asyncio
+import time
+import websockets
+import cv2
+from video_transport import FrameChunker
+from broadcast import BroadcastHub, AsyncQueueBridge
+
+UDP_DATA_SINK = "UDP_DATA"
+WEBSOCKET_DATA_SINK = "WEBSOCKET_DATA"
+UDP_VIDEO_SINK = "UDP_VIDEO"
+WEBSOCKET_VIDEO_SINK = "WEBSOCKET_VIDEO"
+ALL_SINKS = (UDP_DATA_SINK, WEBSOCKET_DATA_SINK, UDP_VIDEO_SINK, WEBSOCKET_VIDEO_SINK)
+
+JPEG_QUALITY = 90
+MIN_JPEG_QUALITY = 40
+JPEG_QUALITY_STEP = 10
+MIN_VIDEO_SCALE = 0.5
+VIDEO_SCALE_STEP = 0.125
+
+# Frames to wait after a change before the measurements are trusted again.
+BITRATE_HOLD_FRAMES = 15
+# Quality only goes back up once the load is this far below the budgets.
+BITRATE_HEADROOM = 0.7
+# Weight of the newest measurement in the moving averages.
+BITRATE_SMOOTHING = 0.2
+# Share of video datagrams the network may drop before it counts as a full
+# budget. Non blocking UDP sends take no time, drops are the only sign of
+# a saturated link.
+BITRATE_MAX_DROP_RATIO = 0.02
+
+# How often video sinks are checked for new clients, in seconds.
+VIDEO_SUBSCRIBER_POLL = 0.1
+# Seconds a UDP video receiver that refused datagrams counts as gone, before
+# frames are sent to it again to check.
+UDP_VIDEO_REFUSED_BACKOFF = 1.0
+
+
+class JpegFrameEncoder:
+
+    def __init__(self, flip_video, quality=JPEG_QUALITY):
+        self.__flip_video = flip_video
+        self.__encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+
+    def encode(self, frame, quality=None, scale=1.0):
+        if scale < 1.0:
+            frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+        if self.__flip_video:
+            frame = cv2.flip(frame, 1)
+
+        if quality is not None:
+            self.__encode_param[1] = int(quality)
+
+        return cv2.imencode(".jpg", frame, self.__encode_param)[1].tobytes()
+
+    def timed_encode(self, frame, quality=None, scale=1.0):
+        start = time.perf_counter()
+        encoded_frame = self.encode(frame, quality, scale)
+
+        return encoded_frame, time.perf_counter() - start
+
+
+class AdaptiveBitrateController:
+
+    def __init__(self, bandwidth_budget=0, encode_time_budget=0, max_quality=JPEG_QUALITY, min_quality=MIN_JPEG_QUALITY, min_scale=MIN_VIDEO_SCALE):
+        # Budgets in bytes per second and seconds per frame, 0 disables each.
+        self.__bandwidth_budget = bandwidth_budget
+        self.__encode_time_budget = encode_time_budget
+        self.__max_quality = max_quality
+        self.__min_quality = min_quality
+        self.__min_scale = min_scale
+        self.quality = max_quality
+        self.scale = 1.0
+        self.__frame_size = None
+        self.__encode_time = None
+        self.__send_time = None
+        self.__drop_ratio = None
+        self.__frame_interval = None
+        self.__last_frame_time = None
+        self.__hold_frames = 0
+
+    def enabled(self):
+        return self.__bandwidth_budget > 0 or self.__encode_time_budget > 0
+
+    def update(self, frame_size, encode_time, send_time, now=None, drop_ratio=0.0):
+        if not self.enabled():
+            return
+
+        if now is None:
+            now = time.monotonic()
+        if self.__last_frame_time is not None:
+            self.__frame_interval = self.__smoothed(self.__frame_interval, now - self.__last_frame_time)
+        self.__last_frame_time = now
+
+        self.__frame_size = self.__smoothed(self.__frame_size, frame_size)
+        self.__encode_time = self.__smoothed(self.__encode_time, encode_time)
+        self.__send_time = self.__smoothed(self.__send_time, send_time)
+        self.__drop_ratio = self.__smoothed(self.__drop_ratio, drop_ratio)
+
+        if self.__hold_frames > 0:
+            self.__hold_frames -= 1
+            return
+        if not self.__frame_interval:
+            return
+
+        load = self.__load()
+        if load > 1.0:
+            self.__step_down()
+        elif load < BITRATE_HEADROOM:
+            self.__step_up()
+
+    def __load(self):
+        # Worst ratio of measured to budgeted use.
+        loads = [0.0]
+        if self.__bandwidth_budget > 0:
+            loads.append(self.__frame_size / self.__frame_interval / self.__bandwidth_budget)
+        if self.__encode_time_budget > 0:
+            loads.append(self.__encode_time / self.__encode_time_budget)
+        # Sends taking longer than a frame mean the link is not keeping up,
+        # whatever the configured bandwidth.
+        loads.append(self.__send_time / self.__frame_interval)
+        loads.append(self.__drop_ratio / BITRATE_MAX_DROP_RATIO)
+
+        return max(loads)
+
+    def __step_down(self):
+        # Quality first, resolution once quality is at its floor.
+        if self.quality > self.__min_quality:
+            self.quality = max(self.__min_quality, self.quality - JPEG_QUALITY_STEP)
+        elif self.scale > self.__min_scale:
+            self.scale = max(self.__min_scale, self.scale - VIDEO_SCALE_STEP)
+        else:
+            return
+
+        self.__hold_frames = BITRATE_HOLD_FRAMES
+
+    def __step_up(self):
+        if self.scale < 1.0:
+            self.scale = min(1.0, self.scale + VIDEO_SCALE_STEP)
+        elif self.quality < self.__max_quality:
+            self.quality = min(self.__max_quality, self.quality + JPEG_QUALITY_STEP)
+        else:
+            return
+
+        self.__hold_frames = BITRATE_HOLD_FRAMES
+
+    @staticmethod
+    def __smoothed(average, value):
+        if average is None:
+            return value
+
+        return average + BITRATE_SMOOTHING * (value - average)
+
+
+class Publisher:
+
+    def __init__(self, data_queue, frame_ring, flip_video, data_sinks, video_sinks, bandwidth_budget=0, encode_time_budget=0):
+        # Every sink runs on this one event loop. Each pose is taken off the
+        # queue once, and each frame is encoded once, for all of them.
+        self.__data_queue = data_queue
+        self.__frame_ring = frame_ring
+        self.__encoder = JpegFrameEncoder(flip_video)
+        self.__bitrate_controller = AdaptiveBitrateController(bandwidth_budget, encode_time_budget)
+        self.__data_sinks = data_sinks
+        self.__video_sinks = video_sinks
+
+    def listen(self):
+        loop = asyncio.get_event_loop()
+        for sink in self.__data_sinks + self.__video_sinks:
+            loop.run_until_complete(sink.start())
+
+        if self.__data_sinks:
+            AsyncQueueBridge(self.__data_queue).start(loop, self.__publish_data)
+
+        if self.__video_sinks:
+            loop.run_until_complete(self.__publish_video())
+        else:
+            loop.run_forever()
+
+    def __publish_data(self, data):
+        for sink in self.__data_sinks:
+            sink.publish(data)
+
+    async def __publish_video(self):
+        loop = asyncio.get_event_loop()
+
+        sequence = 0
+        subscribers = 0
+        while True:
+            # The tracker only draws and writes frames to the ring while it
+            # has subscribers, so without clients video costs nothing.
+            active_sinks = [sink for sink in self.__video_sinks if sink.clients() > 0]
+            active_subscribers = sum(sink.clients() for sink in active_sinks)
+            if active_subscribers != subscribers:
+                self.__frame_ring.add_subscribers(active_subscribers - subscribers)
+                subscribers = active_subscribers
+
+            if not active_sinks:
+                await asyncio.sleep(VIDEO_SUBSCRIBER_POLL)
+                continue
+
+            # Waits off the event loop so websocket handshakes and pings keep running.
+            latest_sequence, frame, _ = await loop.run_in_executor(
+                None, self.__frame_ring.wait, sequence, VIDEO_SUBSCRIBER_POLL)
+            if frame is None or latest_sequence == sequence:
+                continue
+            sequence = latest_sequence
+
+            encoded_frame, encode_time = await loop.run_in_executor(
+                None, self.__encoder.timed_encode, frame,
+                self.__bitrate_controller.quality, self.__bitrate_controller.scale)
+            if not self.__frame_ring.is_valid(sequence):
+                continue
+
+            for sink in active_sinks:
+                sink.publish(encoded_frame)
+
+            self.__bitrate_controller.update(
+                len(encoded_frame), encode_time, max(sink.send_time() for sink in active_sinks),
+                drop_ratio=max(sink.drop_ratio() for sink in active_sinks))
+
+
+class DataPublishClientUDP:
+
+    def __init__(self, server_ip, server_port):
+        self.__server_ip = server_ip
+        self.__server_port = server_port
+        self.__sock = None
+
+    async def start(self):
+        self.__sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.__sock.setblocking(False)
+
+    def publish(self, data):
+        # Binary pose packets are sent as they are.
+        if isinstance(data, str):
+            data = data.encode()
+
+        try:
+            self.__sock.sendto(data, (self.__server_ip, self.__server_port))
+        except OSError:
+            pass
+
+
+class DataPublishWebsocketClient:
+
+    def __init__(self, server_ip, server_port):
+        self.__server_ip = server_ip
+        self.__server_port = server_port
+        self.__hub = None
+
+    async def start(self):
+        self.__hub = BroadcastHub()
+        await websockets.serve(self.time, self.__server_ip, self.__server_port, max_queue=1)
+
+    def publish(self, data):
+        self.__hub.publish(data)
+
+    async def time(self, websocket, path):
+        await send_latest_values(self.__hub, websocket)
+
+
+class ImagePublishClientUDP:
+
+    def __init__(self, server_ip, server_port):
+        self.__server_ip = server_ip
+        self.__server_port = server_port
+        self.__sock = None
+        self.__chunker = FrameChunker()
+        self.__send_time = 0.0
+        self.__drop_ratio = 0.0
+        self.__refused_until = 0.0
+        self.dropped_frames = 0
+
+    async def start(self):
+        self.__sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # Runs on the event loop, a full socket buffer drops the frame instead of blocking.
+        self.__sock.setblocking(False)
+        # Connected, sends fail once the receiver host reports nobody listens
+        # on the port.
+        self.__sock.connect((self.__server_ip, self.__server_port))
+
+    def clients(self):
+        # The configured receiver counts as one client, unless it refused the
+        # last frames. Receivers behind hosts that never report it always count.
+        return 0 if time.monotonic() < self.__refused_until else 1
+
+    def send_time(self):
+        send_time, self.__send_time = self.__send_time, 0.0
+        return send_time
+
+    def drop_ratio(self):
+        # Share of the last frame's chunks that could not be sent.
+        drop_ratio, self.__drop_ratio = self.__drop_ratio, 0.0
+        return drop_ratio
+
+    def publish(self, encoded_frame):
+        # Frames go out in chunks of a frame id, chunk index and chunk count,
+        # see video_transport.FrameReassembler for the receiving side.
+        start = time.perf_counter()
+        chunks = list(self.__chunker.chunks(encoded_frame))
+        sent_chunks = 0
+        try:
+            for chunk in chunks:
+                self.__sock.send(chunk)
+                sent_chunks += 1
+        except ConnectionRefusedError:
+            # Nobody listens, the link itself is fine.
+            self.__refused_until = time.monotonic() + UDP_VIDEO_REFUSED_BACKOFF
+            sent_chunks = len(chunks)
+        except OSError:
+            # A full socket buffer. The rest of the frame is not sent, the
+            # receiver drops the incomplete frame after its deadline.
+            self.dropped_frames += 1
+        self.__send_time = time.perf_counter() - start
+        self.__drop_ratio = 1 - sent_chunks / len(chunks)
+
+
+class ImagePublishWebsocketClient:
+
+    def __init__(self, server_ip, server_port):
+        self.__server_ip = server_ip
+        self.__server_port = server_port
+        self.__hub = None
+        self.__send_time = 0.0
+
+    async def start(self):
+        self.__hub = BroadcastHub()
+        await websockets.serve(self.time, self.__server_ip, self.__server_port, max_queue=1)
+
+    def clients(self):
+        return self.__hub.clients()
+
+    def send_time(self):
+        # Slowest client send since the last call.
+        send_time, self.__send_time = self.__send_time, 0.0
+        return send_time
+
+    def drop_ratio(self):
+        # TCP does not drop, a slow client shows in the send time.
+        return 0.0
+
+    def publish(self, encoded_frame):
+        self.__hub.publish(encoded_frame)
+
+    async def time(self, websocket, path):
+        await send_latest_values(self.__hub, websocket, self.__sent)
+
+    def __sent(self, send_time):
+        self.__send_time = max(self.__send_time, send_time)
+
+
+async def send_latest_values(hub, websocket, sent=None):
+    # Sends the client the values published to the hub, the latest one
+    # whenever it is slower than them. The client is unsubscribed as soon as
+    # it leaves, not on the next send, so a video client gone stops the
+    # tracker writing frames nobody reads right away.
+    slot = hub.subscribe()
+    closed = asyncio.ensure_future(websocket.wait_closed())
+
+    try:
+        while True:
+            next_value = asyncio.ensure_future(slot.get())
+            await asyncio.wait((next_value, closed), return_when=asyncio.FIRST_COMPLETED)
+            if closed.done():
+                next_value.cancel()
+                break
+
+            start = time.perf_counter()
+            await websocket.send(next_value.result())
+            if sent is not None:
+                sent(time.perf_counter() - start)
+    except websockets.ConnectionClosed:
+        pass
+    finally:
+        closed.cancel()
+        hub.unsubscribe(slot)
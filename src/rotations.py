@@ -0,0 +1,90 @@
+import math
+import numpy as np
+
+
+def rotation_matrix_to_quaternion(rot_mtx):
+    # Quaternions are (w, x, y, z).
+    trace = rot_mtx[0, 0] + rot_mtx[1, 1] + rot_mtx[2, 2]
+
+    if trace > 0:
+        s = math.sqrt(trace + 1.0) * 2
+        quaternion = np.array([0.25 * s,
+                               (rot_mtx[2, 1] - rot_mtx[1, 2]) / s,
+                               (rot_mtx[0, 2] - rot_mtx[2, 0]) / s,
+                               (rot_mtx[1, 0] - rot_mtx[0, 1]) / s])
+    elif rot_mtx[0, 0] > rot_mtx[1, 1] and rot_mtx[0, 0] > rot_mtx[2, 2]:
+        s = math.sqrt(1.0 + rot_mtx[0, 0] - rot_mtx[1, 1] - rot_mtx[2, 2]) * 2
+        quaternion = np.array([(rot_mtx[2, 1] - rot_mtx[1, 2]) / s,
+                               0.25 * s,
+                               (rot_mtx[0, 1] + rot_mtx[1, 0]) / s,
+                               (rot_mtx[0, 2] + rot_mtx[2, 0]) / s])
+    elif rot_mtx[1, 1] > rot_mtx[2, 2]:
+        s = math.sqrt(1.0 + rot_mtx[1, 1] - rot_mtx[0, 0] - rot_mtx[2, 2]) * 2
+        quaternion = np.array([(rot_mtx[0, 2] - rot_mtx[2, 0]) / s,
+                               (rot_mtx[0, 1] + rot_mtx[1, 0]) / s,
+                               0.25 * s,
+                               (rot_mtx[1, 2] + rot_mtx[2, 1]) / s])
+    else:
+        s = math.sqrt(1.0 + rot_mtx[2, 2] - rot_mtx[0, 0] - rot_mtx[1, 1]) * 2
+        quaternion = np.array([(rot_mtx[1, 0] - rot_mtx[0, 1]) / s,
+                               (rot_mtx[0, 2] + rot_mtx[2, 0]) / s,
+                               (rot_mtx[1, 2] + rot_mtx[2, 1]) / s,
+                               0.25 * s])
+
+    return quaternion / np.linalg.norm(quaternion)
+
+
+def quaternion_to_rotation_matrix(quaternion):
+    w, x, y, z = quaternion
+
+    return np.array([[1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+                     [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+                     [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)]])
+
+
+def average_quaternions(quaternions):
+    # Good enough for the close orientations seen by cameras looking at one target.
+    reference = quaternions[0]
+    total = np.zeros(4)
+    for quaternion in quaternions:
+        if np.dot(quaternion, reference) < 0:
+            quaternion = -quaternion
+        total += quaternion
+
+    return total / np.linalg.norm(total)
+
+
+def quaternion_multiply(first, second):
+    w1, x1, y1, z1 = first
+    w2, x2, y2, z2 = second
+
+    return np.array([w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2,
+                     w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+                     w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+                     w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2])
+
+
+def quaternion_conjugate(quaternion):
+    return quaternion * np.array([1.0, -1.0, -1.0, -1.0])
+
+
+def quaternion_to_rotation_vector(quaternion):
+    # Takes the shortest rotation, so q and -q give the same vector.
+    if quaternion[0] < 0:
+        quaternion = -quaternion
+
+    sin_half_angle = math.sqrt(quaternion[1] ** 2 + quaternion[2] ** 2 + quaternion[3] ** 2)
+    if sin_half_angle < 1e-9:
+        return 2 * quaternion[1:]
+
+    return quaternion[1:] * (2 * math.atan2(sin_half_angle, quaternion[0]) / sin_half_angle)
+
+
+def rotation_vector_to_quaternion(rotation_vector):
+    angle = math.sqrt(rotation_vector[0] ** 2 + rotation_vector[1] ** 2 + rotation_vector[2] ** 2)
+    if angle < 1e-9:
+        quaternion = np.concatenate(([1.0], 0.5 * rotation_vector))
+    else:
+        quaternion = np.concatenate(([math.cos(angle / 2)], rotation_vector * (math.sin(angle / 2) / angle)))
+
+    return quaternion / np.linalg.norm(quaternion)
@@ -0,0 +1,132 @@
+import numpy as np
+import cv2
+import cv2.aruco as aruco
+from marker_detection_settings import SINGLE_DETECTION, MarkersCubeDetectionSettings
+
+# Markers are drawn with a white quiet zone around their 8 cells (6 data and
+# 2 border), cube faces are the marker and its quiet zone. Narrower zones
+# fall within the detector's adaptive threshold windows on near markers.
+MARKER_CELLS = 8
+QUIET_ZONE_CELLS = 2
+FACE_SCALE = (MARKER_CELLS + 2 * QUIET_ZONE_CELLS) / MARKER_CELLS
+
+BACKGROUND = 160
+
+
+class SyntheticScene:
+
+    def __init__(self, frame_width=1280, frame_height=720, focal_length=900, dictionary="DICT_6X6_250", marker_pixels=240):
+        # A distortion free pinhole camera with its principal point centered.
+        self.__frame_size = (frame_width, frame_height)
+        self.__cam_mtx = np.array([[focal_length, 0, frame_width / 2],
+                                   [0, focal_length, frame_height / 2],
+                                   [0, 0, 1]], dtype=float)
+        self.__dist = np.zeros((1, 5))
+        self.__dictionary = aruco.Dictionary_get(getattr(aruco, dictionary))
+        self.__marker_pixels = marker_pixels
+        self.__faces = {}
+
+    def camera_parameters(self):
+        return self.__cam_mtx, self.__dist
+
+    def render(self, targets, blur=0.0, noise=0.0, random=None):
+        # targets are (detection settings, 4x4 pose in the camera frame)
+        # pairs, the pose of a cube being the pose of its up marker. blur is
+        # a gaussian sigma and noise a gaussian standard deviation, in pixels
+        # and gray levels.
+        faces = []
+        for settings, pose in targets:
+            if settings.identifier == SINGLE_DETECTION:
+                faces.append((settings.marker_id, float(settings.marker_length), pose))
+            else:
+                faces.extend(self.__cube_faces(settings, pose))
+
+        frame = np.full(self.__frame_size[::-1], BACKGROUND, dtype=np.float32)
+        # Farthest first, so nearer faces cover them.
+        for marker_id, marker_length, pose in sorted(faces, key=lambda face: -face[2][2, 3]):
+            self.__draw_face(frame, marker_id, marker_length, pose)
+
+        if blur > 0:
+            frame = cv2.GaussianBlur(frame, (0, 0), blur)
+        if noise > 0:
+            if random is None:
+                random = np.random
+            frame += random.normal(0, noise, frame.shape).astype(np.float32)
+
+        return cv2.cvtColor(np.clip(frame, 0, 255).astype(np.uint8), cv2.COLOR_GRAY2BGR)
+
+    def __cube_faces(self, settings, pose):
+        marker_length = float(settings.markers_length)
+        faces = [(settings.up_marker_id, marker_length, pose)]
+        for marker_id, transformation in settings.transformations.items():
+            faces.append((marker_id, marker_length, np.dot(pose, np.linalg.inv(transformation))))
+
+        # Only faces turned towards the camera are seen.
+        return [face for face in faces if np.dot(face[2][:3, 2], face[2][:3, 3]) < 0]
+
+    def __draw_face(self, frame, marker_id, marker_length, pose):
+        if pose[2, 3] <= 0:
+            return
+
+        face = self.__face(marker_id)
+        half_face = marker_length * FACE_SCALE / 2
+        face_points = np.array([[-half_face, half_face, 0], [half_face, half_face, 0],
+                                [half_face, -half_face, 0], [-half_face, -half_face, 0]])
+        camera_points = np.dot(pose[:3, :3], face_points.T).T + pose[:3, 3]
+        if np.any(camera_points[:, 2] <= 0):
+            return
+
+        image_points, _ = cv2.projectPoints(face_points, cv2.Rodrigues(pose[:3, :3])[0], pose[:3, 3], self.__cam_mtx, self.__dist)
+        # Pixel centers are at integer coordinates, the face edges half a
+        # pixel out, or the marker would be rendered a pixel too small.
+        edge = face.shape[0] - 0.5
+        homography = cv2.getPerspectiveTransform(
+            np.float32([[-0.5, -0.5], [edge, -0.5], [edge, edge], [-0.5, edge]]), image_points.reshape(4, 2).astype(np.float32))
+
+        # Blends on the warped coverage, so face edges are antialiased.
+        warped = cv2.warpPerspective(face, homography, self.__frame_size, flags=cv2.INTER_LINEAR)
+        coverage = cv2.warpPerspective(np.ones_like(face), homography, self.__frame_size, flags=cv2.INTER_LINEAR)
+        frame *= 1 - coverage
+        frame += warped
+
+    def __face(self, marker_id):
+        if marker_id not in self.__faces:
+            marker = aruco.drawMarker(self.__dictionary, int(marker_id), self.__marker_pixels)
+            quiet_zone = self.__marker_pixels * QUIET_ZONE_CELLS // MARKER_CELLS
+            marker = cv2.copyMakeBorder(marker, quiet_zone, quiet_zone, quiet_zone, quiet_zone,
+                                        cv2.BORDER_CONSTANT, value=255)
+            self.__faces[marker_id] = marker.astype(np.float32)
+
+        return self.__faces[marker_id]
+
+
+def synthetic_cube(markers_length, up_marker_id, side_marker_ids, down_marker_id=""):
+    # Settings of an ideal cube with edges as long as its faces, as the cube
+    # mapping would measure it. Side markers go around the up marker's x,
+    # y, -x and -y sides, upright.
+    edge = float(markers_length) * FACE_SCALE
+    center = np.array([0, 0, -edge / 2])
+    up = np.array([0, 0, 1.0])
+
+    transformations = {}
+    for side_marker_id, normal in zip(side_marker_ids, ([1.0, 0, 0], [0, 1.0, 0], [-1.0, 0, 0], [0, -1.0, 0])):
+        if side_marker_id != "":
+            normal = np.array(normal)
+            transformations[side_marker_id] = np.linalg.inv(
+                face_pose(np.cross(up, normal), up, normal, center + normal * edge / 2))
+
+    if down_marker_id != "":
+        transformations[down_marker_id] = np.linalg.inv(
+            face_pose(np.array([-1.0, 0, 0]), np.array([0, 1.0, 0]), -up, center - up * edge / 2))
+
+    return MarkersCubeDetectionSettings(markers_length, up_marker_id, side_marker_ids, down_marker_id, transformations)
+
+
+def face_pose(x_axis, y_axis, z_axis, position):
+    pose = np.eye(4)
+    pose[:3, 0] = x_axis
+    pose[:3, 1] = y_axis
+    pose[:3, 2] = z_axis
+    pose[:3, 3] = position
+
+    return pose
@@ -5,16 +5,30 @@ except ModuleNotFoundError:
     
 import os
 import json
-import socket
-import websockets
-import asyncio
 from multiprocessing import Process, Queue
+from queue import Empty
 import time
 import math
 import numpy as np
 import cv2
-import cv2.aruco as aruco
-from marker_detection_settings import SINGLE_DETECTION, CUBE_DETECTION
+from marker_detection_settings import SINGLE_DETECTION, SingleMarkerDetectionSettings, MarkersCubeDetectionSettings
+from marker_detection import DetectionEngineSettings, PredictedDetectionRegion
+from detection_pipeline import InlineDetection, DetectionWorkerPool
+from multi_camera import MultiCameraDetection, CameraSettings
+from pose_packet import PosePacketEncoder, BINARY_DATA_FORMAT, JSON_DATA_FORMAT
+from pose_filter import ConstantAccelerationFilter, QuaternionPoseFilter, OPENCV_KALMAN_FILTER, CONSTANT_ACCELERATION_FILTER, QUATERNION_FILTER
+from video_source_calibration import CalibrationStore
+from metrics import TrackingMetrics, MetricsServer
+from tracking_display import TrackingDisplay, draw_detection
+from frame_capture import open_frame_capture
+from frame_buffer import SharedFrameRing
+from publishing import Publisher, DataPublishClientUDP, DataPublishWebsocketClient, ImagePublishClientUDP, ImagePublishWebsocketClient, \
+    ALL_SINKS, UDP_DATA_SINK, WEBSOCKET_DATA_SINK, UDP_VIDEO_SINK, WEBSOCKET_VIDEO_SINK
+
+SINGLE_TARGET = 'target'
+
+# Seconds a stopped tracking process gets to release its cameras.
+STOP_TIMEOUT = 5
 
 class TrackingScheduler:
     def __init__(self, start_tracking, stop_tracking):
@@ -25,433 +39,335 @@ class TrackingScheduler:
         while True:
             self.start_tracking.wait()
             self.start_tracking.clear()
-            tracking_config = TrackingCofig.persisted()
-            queue = Queue(1)
+            self.run(TrackingCofig.persisted())
+
+    def run(self, tracking_config):
+        # Tracks until the tracking process ends or stop_tracking is set.
+        # Returns the tracking process exit code, 0 when it had to be
+        # terminated after a stop.
+        queue = Queue(1)
+        frame_ring = SharedFrameRing(
+            max_frame_shape=(tracking_config.frame_height, tracking_config.frame_width, 3))
+
+        publisher_process = Process(target=Publisher(
+            data_queue=queue,
+            frame_ring=frame_ring,
+            flip_video=tracking_config.flip_video,
+            data_sinks=self.__data_sinks(tracking_config),
+            video_sinks=self.__video_sinks(tracking_config),
+            bandwidth_budget=tracking_config.video_bandwidth_budget,
+            encode_time_budget=tracking_config.video_encode_time_budget
+        ).listen)
+        publisher_process.start()
+
+        tracking_process = Process(target=Tracking(
+            queue=queue,
+            frame_ring=frame_ring,
+            device_number=tracking_config.device_number,
+            frame_width=tracking_config.frame_width,
+            frame_height=tracking_config.frame_height,
+            show_video=tracking_config.show_video,
+            flip_video=tracking_config.flip_video,
+            marker_detection_settings=tracking_config.marker_detection_settings,
+            targets=tracking_config.targets,
+            detection_engine_settings=tracking_config.detection_engine_settings or DetectionEngineSettings.persisted(),
+            detection_workers=tracking_config.detection_workers,
+            cameras=tracking_config.cameras,
+            filter_engine=tracking_config.filter_engine,
+            data_format=tracking_config.data_format,
+            translation_offset=tracking_config.translation_offset,
+            stop_tracking=self.stop_tracking,
+            replay_realtime=tracking_config.replay_realtime,
+            metrics_port=tracking_config.metrics_port).track)
+        tracking_process.start()
+
+        exit_code = None
+        while tracking_process.is_alive():
+            if self.stop_tracking.wait(1):
+                # Tracking sees the event too and releases its cameras,
+                # it is only terminated if it does not end in time.
+                tracking_process.join(STOP_TIMEOUT)
+                if tracking_process.is_alive():
+                    tracking_process.terminate()
+                    tracking_process.join()
+                    exit_code = 0
+                break
+
+        if exit_code is None:
+            tracking_process.join()
+            exit_code = tracking_process.exitcode
+
+        publisher_process.terminate()
+        frame_ring.release()
+        self.stop_tracking.clear()
 
-            client_process = Process(target=DataPublishClientUDP(
+        return exit_code
+
+    def __data_sinks(self, tracking_config):
+        data_sinks = []
+        if UDP_DATA_SINK in tracking_config.enabled_sinks:
+            data_sinks.append(DataPublishClientUDP(
                 server_ip=tracking_config.server_ip,
-                server_port=int(tracking_config.server_port),
-                queue=queue
-            ).listen)
-            client_process.start()
-            
-            frame_queue = Queue(1)
-            image_client_process = Process(target=ImagePublishClientUDP(
-                server_ip=tracking_config.video_server_ip,
-                server_port=int(tracking_config.video_server_port),
-                queue=frame_queue,
-                flip_video=tracking_config.flip_video
-            ).listen)
-            image_client_process.start()
-
-            websocket_queue = Queue(1)
-            websocket_client_process = Process(target=DataPublishWebsocketClient(
+                server_port=int(tracking_config.server_port)))
+        if WEBSOCKET_DATA_SINK in tracking_config.enabled_sinks:
+            data_sinks.append(DataPublishWebsocketClient(
                 server_ip=tracking_config.websocket_server_ip,
-                server_port=tracking_config.websocket_server_port,
-                queue=websocket_queue
-            ).listen)
-            websocket_client_process.start()
-            
-            websocket_frame_queue = Queue(1)
-            websocket_image_client_process = Process(target=ImagePublishWebsocketClient(
+                server_port=tracking_config.websocket_server_port))
+
+        return data_sinks
+
+    def __video_sinks(self, tracking_config):
+        video_sinks = []
+        if UDP_VIDEO_SINK in tracking_config.enabled_sinks:
+            video_sinks.append(ImagePublishClientUDP(
+                server_ip=tracking_config.video_server_ip,
+                server_port=int(tracking_config.video_server_port)))
+        if WEBSOCKET_VIDEO_SINK in tracking_config.enabled_sinks:
+            video_sinks.append(ImagePublishWebsocketClient(
                 server_ip=tracking_config.websocket_video_server_ip,
-                server_port=tracking_config.websocket_video_server_port,
-                queue=websocket_frame_queue,
-                flip_video=tracking_config.flip_video
-            ).listen)
-            websocket_image_client_process.start()
-
-            tracking_process = Process(target=Tracking(
-                queue=queue,
-                websocket_queue=websocket_queue,
-                frame_queue=frame_queue,
-                websocket_frame_queue=websocket_frame_queue,
-                device_number=tracking_config.device_number,
-                show_video=tracking_config.show_video,
-                flip_video=tracking_config.flip_video,
-                marker_detection_settings=tracking_config.marker_detection_settings,
-                translation_offset=tracking_config.translation_offset).track)
-            tracking_process.start()
-
-            while True:
-                time.sleep(1)
-
-                if not tracking_process.is_alive():
-                    client_process.terminate()
-                    websocket_client_process.terminate()
-                    image_client_process.terminate()
-                    websocket_image_client_process.terminate()
-                    self.stop_tracking.clear()
-                    break
+                server_port=tracking_config.websocket_video_server_port))
 
-                if self.stop_tracking.wait(0):
-                    tracking_process.terminate()
-                    client_process.terminate()
-                    websocket_client_process.terminate()
-                    image_client_process.terminate()
-                    websocket_image_client_process.terminate()
-                    self.stop_tracking.clear()
-                    break
+        return video_sinks
 
 
 class Tracking:
-    def __init__(self, queue, websocket_queue, frame_queue, websocket_frame_queue, device_number, show_video, flip_video, marker_detection_settings, translation_offset):
+    def __init__(self, queue, frame_ring, device_number, frame_width, frame_height, show_video, flip_video, marker_detection_settings, targets, detection_engine_settings, detection_workers, cameras, filter_engine, data_format, translation_offset, stop_tracking=None, replay_realtime=True, metrics_port=0):
         self.__data_queue = queue
-        self.__data_queue_websocket = websocket_queue
-        self.__frame_queue = frame_queue
-        self.__frame_queue_websocket = websocket_frame_queue
+        self.__frame_ring = frame_ring
         self.__device_number = device_number
+        self.__frame_width = frame_width
+        self.__frame_height = frame_height
         self.__show_video = show_video
         self.__flip_video = flip_video
         self.__marker_detection_settings = marker_detection_settings
+        self.__targets = targets
+        self.__detection_engine_settings = detection_engine_settings
+        self.__detection_workers = detection_workers
+        self.__cameras = cameras
+        self.__filter_engine = filter_engine
+        self.__data_format = data_format
+        self.__calibration_store = None
+        self.__detection_region = None
+        self.__metrics = None
         self.__translation_offset = translation_offset
-        self.oscillation = False
+        self.__stop_tracking = stop_tracking
+        self.__replay_realtime = replay_realtime
+        self.__metrics_port = metrics_port
+        self.__oscillations = {}
 
     def track(self):
-        #Descomentar quando nao for utilizar o DroidCam
-        #video_capture = cv2.VideoCapture(
-            #self.__device_number, cv2.CAP_DSHOW)
-        video_capture = cv2.VideoCapture(
-            self.__device_number)
-
-        video_capture.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-        video_capture.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-
-        detection_result = {}
-        kalman_filter = create_kalman_filter(18, 6, 0.0334)
-        while True:
-            _, frame = video_capture.read()
-
-            if self.__marker_detection_settings.identifier == SINGLE_DETECTION:
-                detection_result = self.__single_marker_detection(frame, kalman_filter)
-            elif self.__marker_detection_settings.identifier == CUBE_DETECTION:
-                detection_result = self.__markers_cube_detection(frame, kalman_filter)
-            else:
-                raise Exception("Invalid detection identifier. Received: {}".format(
-                    self.__marker_detection_settings.identifier))
-
-            self.__publish_video_and_coordinates(json.dumps(detection_result), frame)
-
+        self.__metrics = TrackingMetrics()
+        self.__metrics.set_gauge('detection_scale', float(self.__detection_engine_settings.detection_scale))
+        self.__calibration_store = CalibrationStore()
+
+        # Started first, a port already in use fails before any camera is opened.
+        metrics_server = None
+        if self.__metrics_port > 0:
+            metrics_server = MetricsServer(self.__metrics, port=self.__metrics_port).start()
+
+        # Without configured targets the single marker_detection_settings
+        # target is published in the original, unbatched, format.
+        batched = bool(self.__targets)
+        targets = self.__targets if batched else {SINGLE_TARGET: self.__marker_detection_settings}
+
+        # A detection region can only follow one target.
+        if self.__detection_engine_settings.roi_detection and not batched and not self.__cameras:
+            self.__detection_region = PredictedDetectionRegion(
+                self.__target_points(),
+                self.__detection_engine_settings.roi_padding,
+                self.__detection_engine_settings.roi_max_misses)
+
+        frame_capture = None
+        if not self.__cameras:
+            frame_capture = open_frame_capture(
+                self.__device_number, self.__frame_width, self.__frame_height, self.__replay_realtime).start()
+
+        if self.__cameras:
+            # Poses come already fused in the world frame, and the first
+            # camera worker writes the published video itself.
             if self.__show_video:
-                self.__show_video_result(frame, detection_result)
-
-            if cv2.waitKey(1) & 0xFF == ord('q'):
+                # The shown video is read back from the ring.
+                self.__frame_ring.add_subscribers(1)
+            detection = MultiCameraDetection(
+                self.__cameras, self.__frame_width, self.__frame_height, targets,
+                self.__detection_engine_settings, self.__translation_offset, self.__frame_ring,
+                replay_realtime=self.__replay_realtime)
+        elif self.__detection_workers > 0:
+            detection = DetectionWorkerPool(
+                self.__detection_workers, targets, self.__detection_engine_settings,
+                self.__translation_offset)
+        else:
+            detection = InlineDetection(
+                targets, self.__detection_engine_settings, self.__translation_offset)
+        detection.start(frame_capture, self.__next_detection_region)
+
+        display = None
+        if self.__show_video:
+            display = TrackingDisplay(self.__flip_video, self.__metrics, self.__frame_ring).start()
+
+        pose_filters = {target_id: create_pose_filter(self.__filter_engine, 0.0334) for target_id in targets}
+        pose_packet_encoder = PosePacketEncoder(len(targets))
+        sequence = 0
+        dropped_frames = 0
+        while True:
+            frame_start = time.perf_counter()
+            next_result = detection.next_result()
+            if next_result is None:
                 break
 
-        video_capture.release()
-        cv2.destroyAllWindows()
-        if self.__frame_queue_websocket.full():
-            self.__frame_queue_websocket.get()
+            frame, capture_timestamp, (corners, ids, poses) = next_result
+
+            # Stages up to pose estimation are timed by the detection
+            # pipeline, possibly in other processes.
+            for stage, stage_time in detection.stage_times().items():
+                self.__metrics.observe(stage, stage_time)
+            total_dropped_frames = detection.dropped_frames()
+            if total_dropped_frames != dropped_frames:
+                self.__metrics.increment('dropped_frames', total_dropped_frames - dropped_frames)
+                dropped_frames = total_dropped_frames
+
+            video_subscribers = self.__frame_ring.subscribers()
+            self.__metrics.set_gauge('video_subscribers', video_subscribers)
+            # Published frames are drawn here, shown only ones on the display
+            # thread, pose only runs skip the video work entirely.
+            drawn = frame is not None and video_subscribers > 0
+            if drawn:
+                draw_detection(frame, corners, poses, *self.__calibration_store.camera_parameters())
+
+            start = time.perf_counter()
+            detection_results = {}
+            for target_id, pose_filter in pose_filters.items():
+                rvec, tvec = poses.get(target_id, (None, None))
+                detection_results[target_id] = self.__detection_result(
+                    target_id, rvec, tvec, capture_timestamp, pose_filter)
+            self.__metrics.observe('filter', time.perf_counter() - start)
+
+            if batched:
+                detection_result = {
+                    'timestamp': time.time(),
+                    'capture_timestamp': capture_timestamp,
+                    'targets': detection_results}
+            else:
+                detection_result = detection_results[SINGLE_TARGET]
 
-    def __single_marker_detection(self, frame, filter):
+            if self.__detection_region is not None:
+                self.__update_detection_region(frame.shape, detection_result, pose_filters[SINGLE_TARGET])
 
-        corners, ids = self.__detect_markers(frame)
+            sequence += 1
+            start = time.perf_counter()
+            if self.__data_format == BINARY_DATA_FORMAT:
+                data = pose_packet_encoder.encode(
+                    sequence, capture_timestamp, detection_result['timestamp'], list(detection_results.values()))
+            else:
+                data = json.dumps(detection_result)
+            self.__metrics.observe('serialization', time.perf_counter() - start)
 
-        marker_rvec = None
-        marker_tvec = None
-        if np.all(ids is not None):
-            marker_found = False
-            marker_index = None
+            self.__publish_video_and_coordinates(data, frame if video_subscribers > 0 else None, capture_timestamp)
 
-            for i in range(0, ids.size):
-                if ids[i][0] == self.__marker_detection_settings.marker_id:
-                    marker_found = True
-                    marker_index = i
+            if display is not None:
+                drawing = None
+                if not drawn:
+                    drawing = (corners, poses) + tuple(self.__calibration_store.camera_parameters())
+                display.show(frame, detection_result, batched, drawing)
+                if display.quit_requested():
                     break
 
-            if marker_found:
-                cam_mtx, dist = self.__camera_parameters()
-                rvecs, tvecs, _ = aruco.estimatePoseSingleMarkers(
-                    corners, float(self.__marker_detection_settings.marker_length), cam_mtx, dist)
-
-                marker_position = self.__get_position_matrix(
-                    rvecs[marker_index], tvecs[marker_index])
-
-                marker_position = self.__apply_transformation(
-                    marker_position, self.__translation_offset)
-
-                marker_rvec, marker_tvec = self.__get_rvec_and_tvec(
-                    marker_position)
-
-                aruco.drawAxis(frame, cam_mtx, dist,
-                               marker_rvec, marker_tvec, 5)
-
-        return self.__detection_result(marker_rvec, marker_tvec, filter)
-
-    def __markers_cube_detection(self, frame, filter):
-        corners, ids = self.__detect_markers(frame)
-
-        main_marker_rvec = None
-        main_marker_tvec = None
-        if np.all(ids is not None):
-            
-            cam_mtx, dist = self.__camera_parameters()
-            rvecs, tvecs, _ = aruco.estimatePoseSingleMarkers(
-                corners, float(self.__marker_detection_settings.markers_length), cam_mtx, dist)
-
-            choosen_marker_index = 0
-            choosen_marker_id = ids[0][0]
-            for i in range(0, ids.size):
-                if tvecs[choosen_marker_index][0][2] > tvecs[i][0][2]:
-                    choosen_marker_id = ids[i][0]
-                    choosen_marker_index = i
-
-            if choosen_marker_id == self.__marker_detection_settings.up_marker_id or choosen_marker_id in self.__marker_detection_settings.transformations:
-                choosen_marker_position = self.__get_position_matrix(
-                    rvecs[choosen_marker_index], tvecs[choosen_marker_index])
-
-                if choosen_marker_id != self.__marker_detection_settings.up_marker_id:
-                    choosen_marker_position = self.__apply_transformation(
-                        choosen_marker_position, self.__marker_detection_settings.transformations[choosen_marker_id])
-
-                choosen_marker_position = self.__apply_transformation(
-                    choosen_marker_position, self.__translation_offset)
-
-                main_marker_rvec, main_marker_tvec = self.__get_rvec_and_tvec(
-                    choosen_marker_position)
-
-                aruco.drawAxis(frame, cam_mtx, dist,
-                            main_marker_rvec, main_marker_tvec, 5)
-
-        return self.__detection_result(main_marker_rvec, main_marker_tvec, filter)
-
-    def __detect_markers(self, frame):
-        parameters = aruco.DetectorParameters_create()
-        parameters.adaptiveThreshConstant = 7
-        parameters.cornerRefinementMethod = aruco.CORNER_REFINE_CONTOUR
-
-        corners, ids, _ = aruco.detectMarkers(
-            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY),
-            aruco.Dictionary_get(aruco.DICT_6X6_250),
-            parameters=parameters)
-
-        aruco.drawDetectedMarkers(frame, corners)
-
-        return corners, ids
-
-    def __camera_parameters(self):
-        if os.path.exists('../assets/configs/') and os.path.isfile('../assets/configs/selected_cam_mtx.npy') and os.path.isfile('../assets/configs/selected_dist.npy'):
-            cam_mtx = np.load(
-                '../assets/configs/selected_cam_mtx.npy')
-            dist = np.load(
-                '../assets/configs/selected_dist.npy')
-        
-        return cam_mtx, dist
-
-    def __get_position_matrix(self, rvec, tvec):
-        rot_mtx = np.zeros(shape=(3, 3))
-        cv2.Rodrigues(rvec, rot_mtx)
-
-        position = np.concatenate(
-            (rot_mtx, np.transpose(tvec)), axis=1)
-        position = np.concatenate(
-            (position, np.array([[0, 0, 0, 1]])))
-
-        return position
-
-    def __get_rvec_and_tvec(self, position_matrix):
-
-        tvec_t = np.delete(position_matrix[:, 3], (3))
-
-        position_matrix = np.delete(
-            position_matrix, 3, 0)
-        position_matrix = np.delete(
-            position_matrix, 3, 1)
-
-        rvec_t, _ = cv2.Rodrigues(position_matrix)
+            self.__metrics.observe('frame', time.perf_counter() - frame_start)
 
-        return rvec_t.T, tvec_t.T
-
-    def __apply_transformation(self, position_matrix, transformation):
-        return np.dot(position_matrix, transformation)
-
-    def __detection_result(self, rvec, tvec, filter):
-        detection_result = {}
-
-        detection_result['timestamp'] = time.time()
-
-        success = rvec is not None and tvec is not None
-        detection_result['success'] = success
-
-        if success:
-            rot_mtx = np.zeros(shape=(3, 3))
-            cv2.Rodrigues(rvec, rot_mtx)
+            if self.__stop_tracking is not None and self.__stop_tracking.is_set():
+                break
 
-            detection_result['translation_x'] = tvec.item(0)
-            detection_result['translation_y'] = tvec.item(1)
-            detection_result['translation_z'] = tvec.item(2)
-            detection_result['rotation_right_x'] = rot_mtx.item(0, 0)
-            detection_result['rotation_right_y'] = rot_mtx.item(1, 0)
-            detection_result['rotation_right_z'] = rot_mtx.item(2, 0)
-            detection_result['rotation_up_x'] = rot_mtx.item(0, 1)
-            detection_result['rotation_up_y'] = rot_mtx.item(1, 1)
-            detection_result['rotation_up_z'] = rot_mtx.item(2, 1)
-            detection_result['rotation_forward_x'] = rot_mtx.item(0, 2)
-            detection_result['rotation_forward_y'] = rot_mtx.item(1, 2)
-            detection_result['rotation_forward_z'] = rot_mtx.item(2, 2)
+        # Live cameras never end on their own, only replayed recordings do.
+        camera_lost = detection.lost() if self.__cameras else frame_capture.lost()
+
+        detection.stop()
+        if display is not None:
+            display.stop()
+        if metrics_server is not None:
+            metrics_server.stop()
+        if self.__cameras and self.__show_video:
+            self.__frame_ring.add_subscribers(-1)
+        if frame_capture is not None:
+            frame_capture.release()
+
+        if camera_lost:
+            # Fails the tracking process, a supervisor can restart it.
+            raise IOError("The camera was lost")
+
+    def __next_detection_region(self):
+        region = None
+        if self.__detection_region is not None:
+            region = self.__detection_region.region()
+
+        self.__metrics.increment('full_frame_detections' if region is None else 'region_detections')
+
+        return region
+
+    def __target_points(self):
+        # Marker, or whole cube, corners expressed in the published pose frame.
+        if self.__marker_detection_settings.identifier == SINGLE_DETECTION:
+            half_length = float(self.__marker_detection_settings.marker_length) / 2
+            points = [[-half_length, half_length, 0], [half_length, half_length, 0],
+                      [half_length, -half_length, 0], [-half_length, -half_length, 0]]
+        else:
+            length = float(self.__marker_detection_settings.markers_length)
+            half_length = length / 2
+            points = [[x, y, z] for x in (-half_length, half_length)
+                      for y in (-half_length, half_length) for z in (0, -length)]
+
+        points = np.concatenate((np.array(points), np.ones((len(points), 1))), axis=1)
+        points = np.dot(np.linalg.pinv(self.__translation_offset), points.T).T
+
+        return np.ascontiguousarray(points[:, :3])
+
+    def __update_detection_region(self, frame_shape, detection_result, filter):
+        cam_mtx, dist = self.__calibration_store.camera_parameters()
+        if not detection_result['success'] or cam_mtx is None:
+            self.__detection_region.missed()
+            return
+
+        predicted_state = np.dot(filter.transitionMatrix, filter.statePost)
+        rot_mtx = np.array([[detection_result['rotation_right_x'], detection_result['rotation_up_x'], detection_result['rotation_forward_x']],
+                            [detection_result['rotation_right_y'], detection_result['rotation_up_y'], detection_result['rotation_forward_y']],
+                            [detection_result['rotation_right_z'], detection_result['rotation_up_z'], detection_result['rotation_forward_z']]])
+
+        self.__detection_region.predicted(
+            rot_mtx, predicted_state[0:3].ravel(), cam_mtx, dist, frame_shape)
+
+    def __detection_result(self, target_id, rvec, tvec, capture_timestamp, filter):
+        detection_result, self.__oscillations[target_id] = create_detection_result(
+            rvec, tvec, capture_timestamp, self.__filter_engine, filter, self.__oscillations.get(target_id, False))
 
-            measurements = create_measurement_matrix(detection_result, rot_mtx)
-            self.oscillation = update_detection_result(filter, measurements, detection_result, self.oscillation)
-        
         return detection_result
 
-    def __publish_video_and_coordinates(self, data, frame):
+    def __publish_video_and_coordinates(self, data, frame, capture_timestamp):
+        # Replaces a pose the publisher did not take yet. The publisher may
+        # take it in between, so never block on the get.
+        start = time.perf_counter()
         if self.__data_queue.full():
-            self.__data_queue.get()
+            try:
+                self.__data_queue.get_nowait()
+                self.__metrics.increment('queue_overwrites')
+            except Empty:
+                pass
 
         self.__data_queue.put(data)
+        self.__metrics.observe('publish', time.perf_counter() - start)
 
-        if self.__data_queue_websocket.full():
-            self.__data_queue_websocket.get()
-
-        self.__data_queue_websocket.put(data)
-
-        if self.__frame_queue.full():
-            self.__frame_queue.get()
-
-        self.__frame_queue.put(frame)
-
-        if self.__frame_queue_websocket.full():
-            self.__frame_queue_websocket.get()
-
-        self.__frame_queue_websocket.put(frame)
-
-    def __show_video_result(self, frame, detection_result):
-        win_name = "Tracking"
-        cv2.namedWindow(win_name, cv2.WND_PROP_FULLSCREEN)
-        cv2.setWindowProperty(
-            win_name, cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
-
-        if self.__flip_video:
-            frame = cv2.flip(frame, 1)
-
-        font = cv2.FONT_HERSHEY_SIMPLEX
-        font_scale = 0.6
-        font_color = (0, 255, 0)
-
-        cv2.putText(frame, 'timestamp: {}'.format(detection_result['timestamp']), (0, 20),
-                    font, font_scale, font_color, 2, cv2.LINE_AA)
-        cv2.putText(frame, 'success: {}'.format(detection_result['success']), (0, 40),
-                    font, font_scale, font_color, 2, cv2.LINE_AA)
-
-        if detection_result['success'] == 1:
-            cv2.putText(frame, 'translation_x: {:.2f}'.format(detection_result['translation_x']), (0, 60),
-                        font, font_scale, font_color, 2, cv2.LINE_AA)     
-            cv2.putText(frame, 'translation_y: {:.2f}'.format(detection_result['translation_y']), (0, 80),
-                        font, font_scale, font_color, 2, cv2.LINE_AA)
-            cv2.putText(frame, 'translation_z: {:.2f}'.format(detection_result['translation_z']), (0, 100),
-                        font, font_scale, font_color, 2, cv2.LINE_AA)
-            cv2.putText(frame, 'rotation_right_x: {:.2f}'.format(detection_result['rotation_right_x']), (0, 120),
-                        font, font_scale, font_color, 2, cv2.LINE_AA)
-            cv2.putText(frame, 'rotation_right_y: {:.2f}'.format(detection_result['rotation_right_y']), (0, 140),
-                        font, font_scale, font_color, 2, cv2.LINE_AA)
-            cv2.putText(frame, 'rotation_right_z: {:.2f}'.format(detection_result['rotation_right_z']), (0, 160),
-                        font, font_scale, font_color, 2, cv2.LINE_AA)
-            cv2.putText(frame, 'rotation_up_x: {:.2f}'.format(detection_result['rotation_up_x']), (0, 180),
-                        font, font_scale, font_color, 2, cv2.LINE_AA)
-            cv2.putText(frame, 'rotation_up_y: {:.2f}'.format(detection_result['rotation_up_y']), (0, 200),
-                        font, font_scale, font_color, 2, cv2.LINE_AA)
-            cv2.putText(frame, 'rotation_up_z: {:.2f}'.format(detection_result['rotation_up_z']), (0, 220),
-                        font, font_scale, font_color, 2, cv2.LINE_AA)
-            cv2.putText(frame, 'rotation_forward_x: {:.2f}'.format(detection_result['rotation_forward_x']), (0, 240),
-                        font, font_scale, font_color, 2, cv2.LINE_AA)
-            cv2.putText(frame, 'rotation_forward_y: {:.2f}'.format(detection_result['rotation_forward_y']), (0, 260),
-                        font, font_scale, font_color, 2, cv2.LINE_AA)
-            cv2.putText(frame, 'rotation_forward_z: {:.2f}'.format(detection_result['rotation_forward_z']), (0, 280),
-                        font, font_scale, font_color, 2, cv2.LINE_AA)
-
-        cv2.putText(frame, "Q - Quit ", (0, 305), font,
-                    font_scale, font_color, 2, cv2.LINE_AA)
-
-        cv2.imshow(win_name, frame)
-
-class DataPublishClientUDP:
-
-    def __init__(self, server_ip, server_port, queue):
-        self.__server_ip = server_ip
-        self.__server_port = server_port
-        self.__queue = queue
-
-    def listen(self):
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-
-        while True:
-            data = self.__queue.get()
-            sock.sendto(data.encode(), (self.__server_ip, self.__server_port))
-
-class ImagePublishClientUDP:
-
-    def __init__(self, server_ip, server_port, queue, flip_video):
-        self.__server_ip = server_ip
-        self.__server_port = server_port
-        self.__queue = queue
-        self.__flip_video = flip_video
-    
-    def listen(self):
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), 90]
-
-        while True:
-            frame = self.__queue.get()
-            if self.__flip_video:
-                frame = cv2.flip(frame, 1)
-            frame = bytes(cv2.imencode(".jpg", frame, encode_param)[1].tostring())
-            sock.sendto(frame, (self.__server_ip, self.__server_port))
-
-
-class DataPublishWebsocketClient:
-
-    def __init__(self, server_ip, server_port, queue):
-        self.__queue = queue
-        self.__server_ip = server_ip
-        self.__server_port = server_port
-
-    
-    def listen(self):
-        start_server = websockets.serve(self.time, self.__server_ip, self.__server_port, max_queue=1)
-
-        asyncio.get_event_loop().run_until_complete(start_server)
-        asyncio.get_event_loop().run_forever()
-
-    async def time(self, websocket, path):
-
-        while True:
-            data = self.__queue.get()
-            await websocket.send(data)
-            await asyncio.sleep(0.016)
-
-class ImagePublishWebsocketClient:
-
-    def __init__(self, server_ip, server_port, queue, flip_video):
-        self.__queue = queue
-        self.__server_ip = server_ip
-        self.__server_port = server_port
-        self.__flip_video = flip_video
-    
-    def listen(self):
-        start_server = websockets.serve(self.time, self.__server_ip, self.__server_port, max_queue=1)
-
-        asyncio.get_event_loop().run_until_complete(start_server)
-        asyncio.get_event_loop().run_forever()
-
-    async def time(self, websocket, path):
-        encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), 90]
-
-        while True:
-            frame = self.__queue.get()
-            if self.__flip_video:
-                frame = cv2.flip(frame, 1)
-            frame = bytes(cv2.imencode(".jpg", frame, encode_param)[1].tostring())
-            await websocket.send(frame)
-            await asyncio.sleep(0.016)
-
-
+        if frame is not None:
+            start = time.perf_counter()
+            self.__frame_ring.write(frame, capture_timestamp)
+            self.__metrics.observe('video_write', time.perf_counter() - start)
+            self.__metrics.increment('published_frames')
 
 class TrackingCofig:
 
     def __init__(self, device_number, device_calibration_dir, calibration_number, cube_number, show_video, flip_video,
                  server_ip, server_port, video_server_ip, video_server_port,
-                 websocket_server_ip, websocket_server_port, websocket_video_server_ip, websocket_video_server_port, marker_detection_settings, translation_offset):
+                 websocket_server_ip, websocket_server_port, websocket_video_server_ip, websocket_video_server_port, marker_detection_settings, translation_offset,
+                 frame_width, frame_height, detection_workers, cameras, targets, filter_engine, data_format,
+                 video_bandwidth_budget, video_encode_time_budget, enabled_sinks, replay_realtime, metrics_port,
+                 detection_engine_settings):
         self.device_number = device_number
         self.device_calibration_dir = device_calibration_dir
         self.calibration_number = calibration_number
@@ -468,6 +384,28 @@ class TrackingCofig:
         self.websocket_video_server_port = websocket_video_server_port
         self.marker_detection_settings = marker_detection_settings
         self.translation_offset = translation_offset
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.detection_workers = detection_workers
+        # Empty tracks the single device_number camera.
+        self.cameras = cameras
+        # Target id to marker or cube detection settings, empty tracks
+        # marker_detection_settings alone.
+        self.targets = targets
+        self.filter_engine = filter_engine
+        self.data_format = data_format
+        # Bytes per second and seconds per frame, 0 keeps the full video quality.
+        self.video_bandwidth_budget = video_bandwidth_budget
+        self.video_encode_time_budget = video_encode_time_budget
+        self.enabled_sinks = enabled_sinks
+        # Only used when a device number is a recording path, False replays
+        # every frame as fast as tracking takes them.
+        self.replay_realtime = replay_realtime
+        # Local port serving the tracking metrics as JSON, 0 disables it.
+        self.metrics_port = metrics_port
+        # None uses the detection engine settings shared with calibration and
+        # the cube mapping, see DetectionEngineSettings.persisted.
+        self.detection_engine_settings = detection_engine_settings
 
     @classmethod
     def persisted(cls):
@@ -476,26 +414,56 @@ class TrackingCofig:
 
         try:
             with open('../assets/configs/tracking_config_data.pkl', 'rb') as file:
-                tracking_config_data = pickle.load(file)
-
-                return cls(tracking_config_data['device_number'],
-                           tracking_config_data['device_calibration_dir'],
-                           tracking_config_data['calibration_number'],
-                           tracking_config_data['cube_number'],
-                           tracking_config_data['show_video'],
-                           tracking_config_data['flip_video'],
-                           tracking_config_data['server_ip'],
-                           tracking_config_data['server_port'],
-                           tracking_config_data['video_server_ip'],
-                           tracking_config_data['video_server_port'],
-                           tracking_config_data['websocket_server_ip'],
-                           tracking_config_data['websocket_server_port'],
-                           tracking_config_data['websocket_video_server_ip'],
-                           tracking_config_data['websocket_video_server_port'],
-                           tracking_config_data['marker_detection_settings'],
-                           tracking_config_data['translation_offset'])
+                return cls.from_data(pickle.load(file))
         except FileNotFoundError:
-            return cls(0, "", 0, 0, True, False, "localhost", "9000", "localhost", "9000", "localhost", "5678", "localhost", "9000", None, np.zeros(shape=(4, 4)))
+            return cls(0, "", 0, 0, True, False, "localhost", "9000", "localhost", "9000", "localhost", "5678", "localhost", "9000", None, np.zeros(shape=(4, 4)),
+                       1280, 720, 0, [], {}, OPENCV_KALMAN_FILTER, JSON_DATA_FORMAT, 0, 0, list(ALL_SINKS), True, 0, None)
+
+    @classmethod
+    def from_file(cls, path):
+        # A pickle as written by persist, or the same keys as JSON.
+        if path.endswith('.json'):
+            with open(path, 'r') as file:
+                return cls.from_data(json_config_data(json.load(file)))
+
+        with open(path, 'rb') as file:
+            return cls.from_data(pickle.load(file))
+
+    @classmethod
+    def from_data(cls, tracking_config_data):
+        detection_engine_settings = tracking_config_data.get('detection_engine_settings')
+        if detection_engine_settings is not None:
+            detection_engine_settings = DetectionEngineSettings.from_data(detection_engine_settings)
+
+        return cls(tracking_config_data['device_number'],
+                   tracking_config_data['device_calibration_dir'],
+                   tracking_config_data['calibration_number'],
+                   tracking_config_data['cube_number'],
+                   tracking_config_data['show_video'],
+                   tracking_config_data['flip_video'],
+                   tracking_config_data['server_ip'],
+                   tracking_config_data['server_port'],
+                   tracking_config_data['video_server_ip'],
+                   tracking_config_data['video_server_port'],
+                   tracking_config_data['websocket_server_ip'],
+                   tracking_config_data['websocket_server_port'],
+                   tracking_config_data['websocket_video_server_ip'],
+                   tracking_config_data['websocket_video_server_port'],
+                   tracking_config_data['marker_detection_settings'],
+                   tracking_config_data['translation_offset'],
+                   tracking_config_data.get('frame_width', 1280),
+                   tracking_config_data.get('frame_height', 720),
+                   tracking_config_data.get('detection_workers', 0),
+                   tracking_config_data.get('cameras', []),
+                   tracking_config_data.get('targets', {}),
+                   tracking_config_data.get('filter_engine', OPENCV_KALMAN_FILTER),
+                   tracking_config_data.get('data_format', JSON_DATA_FORMAT),
+                   tracking_config_data.get('video_bandwidth_budget', 0),
+                   tracking_config_data.get('video_encode_time_budget', 0),
+                   tracking_config_data.get('enabled_sinks', list(ALL_SINKS)),
+                   tracking_config_data.get('replay_realtime', True),
+                   tracking_config_data.get('metrics_port', 0),
+                   detection_engine_settings)
 
     def persist(self):
         # Overwrites any existing file.
@@ -516,7 +484,21 @@ class TrackingCofig:
                 'websocket_video_server_ip': self.websocket_video_server_ip,
                 'websocket_video_server_port': self.websocket_video_server_port,
                 'marker_detection_settings': self.marker_detection_settings,
-                'translation_offset': self.translation_offset}, output, pickle.HIGHEST_PROTOCOL)
+                'translation_offset': self.translation_offset,
+                'frame_width': self.frame_width,
+                'frame_height': self.frame_height,
+                'detection_workers': self.detection_workers,
+                'cameras': self.cameras,
+                'targets': self.targets,
+                'filter_engine': self.filter_engine,
+                'data_format': self.data_format,
+                'video_bandwidth_budget': self.video_bandwidth_budget,
+                'video_encode_time_budget': self.video_encode_time_budget,
+                'enabled_sinks': self.enabled_sinks,
+                'replay_realtime': self.replay_realtime,
+                'metrics_port': self.metrics_port,
+                'detection_engine_settings': None if self.detection_engine_settings is None else
+                self.detection_engine_settings.to_data()}, output, pickle.HIGHEST_PROTOCOL)
 
 def rotation_matrix_to_euler(R):
     
@@ -590,6 +572,51 @@ def create_kalman_filter(num_state, num_measurements, delta_time):
     kalman_filter.measurementMatrix[5, 11] = 1
     return kalman_filter
 
+def create_pose_filter(filter_engine, delta_time):
+    if filter_engine == CONSTANT_ACCELERATION_FILTER:
+        return ConstantAccelerationFilter(delta_time)
+    if filter_engine == QUATERNION_FILTER:
+        return QuaternionPoseFilter(delta_time)
+
+    return create_kalman_filter(18, 6, delta_time)
+
+def create_detection_result(rvec, tvec, capture_timestamp, filter_engine, filter, oscillation):
+    detection_result = {}
+
+    detection_result['timestamp'] = time.time()
+    detection_result['capture_timestamp'] = capture_timestamp
+
+    success = rvec is not None and tvec is not None
+    detection_result['success'] = success
+
+    if success:
+        rot_mtx = np.zeros(shape=(3, 3))
+        cv2.Rodrigues(rvec, rot_mtx)
+
+        detection_result['translation_x'] = tvec.item(0)
+        detection_result['translation_y'] = tvec.item(1)
+        detection_result['translation_z'] = tvec.item(2)
+        detection_result['rotation_right_x'] = rot_mtx.item(0, 0)
+        detection_result['rotation_right_y'] = rot_mtx.item(1, 0)
+        detection_result['rotation_right_z'] = rot_mtx.item(2, 0)
+        detection_result['rotation_up_x'] = rot_mtx.item(0, 1)
+        detection_result['rotation_up_y'] = rot_mtx.item(1, 1)
+        detection_result['rotation_up_z'] = rot_mtx.item(2, 1)
+        detection_result['rotation_forward_x'] = rot_mtx.item(0, 2)
+        detection_result['rotation_forward_y'] = rot_mtx.item(1, 2)
+        detection_result['rotation_forward_z'] = rot_mtx.item(2, 2)
+
+        if filter_engine == QUATERNION_FILTER:
+            update_filtered_pose(filter, detection_result, rot_mtx, capture_timestamp)
+        else:
+            measurements = create_measurement_matrix(detection_result, rot_mtx)
+            # Only the constant acceleration filter steps by the real capture interval.
+            oscillation = update_detection_result(
+                filter, measurements, detection_result, oscillation,
+                capture_timestamp if filter_engine == CONSTANT_ACCELERATION_FILTER else None)
+
+    return detection_result, oscillation
+
 def create_measurement_matrix(measurement, rot_mtx):
     euler_angles = rotation_matrix_to_euler(rot_mtx)
     measurements = np.zeros(6)
@@ -602,8 +629,11 @@ def create_measurement_matrix(measurement, rot_mtx):
         
     return measurements
 
-def update_detection_result(filter, measurements, detection_result, oscillation):
-    filter.predict()
+def update_detection_result(filter, measurements, detection_result, oscillation, capture_timestamp=None):
+    if capture_timestamp is None:
+        filter.predict()
+    else:
+        filter.predict(capture_timestamp)
     filter.correct(measurements)
     
     estimated_position = filter.statePost
@@ -637,4 +667,48 @@ def update_detection_result(filter, measurements, detection_result, oscillation)
         detection_result['rotation_forward_x'] = filtered_rot_mtx.item(0, 2)
         detection_result['rotation_forward_y'] = filtered_rot_mtx.item(1, 2)
         detection_result['rotation_forward_z'] = filtered_rot_mtx.item(2, 2)
-    return oscillation
\ No newline at end of file
+    return oscillation
+
+def update_filtered_pose(filter, detection_result, rot_mtx, capture_timestamp):
+    translation, filtered_rot_mtx = filter.update(
+        np.array([detection_result['translation_x'], detection_result['translation_y'], detection_result['translation_z']]),
+        rot_mtx, capture_timestamp)
+
+    detection_result['translation_x'] = float(translation[0])
+    detection_result['translation_y'] = float(translation[1])
+    detection_result['translation_z'] = float(translation[2])
+    detection_result['rotation_right_x'] = filtered_rot_mtx.item(0, 0)
+    detection_result['rotation_right_y'] = filtered_rot_mtx.item(1, 0)
+    detection_result['rotation_right_z'] = filtered_rot_mtx.item(2, 0)
+    detection_result['rotation_up_x'] = filtered_rot_mtx.item(0, 1)
+    detection_result['rotation_up_y'] = filtered_rot_mtx.item(1, 1)
+    detection_result['rotation_up_z'] = filtered_rot_mtx.item(2, 1)
+    detection_result['rotation_forward_x'] = filtered_rot_mtx.item(0, 2)
+    detection_result['rotation_forward_y'] = filtered_rot_mtx.item(1, 2)
+    detection_result['rotation_forward_z'] = filtered_rot_mtx.item(2, 2)
+
+
+def json_config_data(tracking_config_data):
+    # JSON configs hold plain values where the pickle holds objects: detection
+    # settings as dicts with an identifier, matrices as nested lists.
+    tracking_config_data = dict(tracking_config_data)
+    tracking_config_data['marker_detection_settings'] = json_detection_settings(
+        tracking_config_data['marker_detection_settings'], tracking_config_data['cube_number'])
+    tracking_config_data['translation_offset'] = np.array(tracking_config_data['translation_offset'], dtype=float)
+    tracking_config_data['targets'] = {
+        target_id: json_detection_settings(settings, tracking_config_data['cube_number'])
+        for target_id, settings in tracking_config_data.get('targets', {}).items()}
+    tracking_config_data['cameras'] = [
+        CameraSettings(camera['device_number'], camera['calibration_dir'], np.array(camera['extrinsic'], dtype=float))
+        for camera in tracking_config_data.get('cameras', [])]
+
+    return tracking_config_data
+
+
+def json_detection_settings(settings, cube_number):
+    if settings['identifier'] == SINGLE_DETECTION:
+        return SingleMarkerDetectionSettings(settings['marker_length'], settings['marker_id'])
+
+    # Cubes are mapped from the GUI, only their id is configured.
+    return MarkersCubeDetectionSettings.persisted(settings.get('cube_id', cube_number))
+
@@ -0,0 +1,174 @@
+import threading
+import time
+import cv2
+from cv2 import aruco
+
+WINDOW_NAME = "Tracking"
+
+# The preview is for people, it needs no more than this.
+DISPLAY_MAX_FPS = 30
+
+
+class TrackingDisplay:
+
+    def __init__(self, flip_video, metrics, frame_ring, max_fps=DISPLAY_MAX_FPS):
+        # Owns the tracking window on its own thread, tracking only hands over
+        # its latest frame and result and never waits on drawing or the GUI.
+        self.__flip_video = flip_video
+        self.__metrics = metrics
+        self.__frame_ring = frame_ring
+        self.__frame_interval = 1.0 / max_fps
+        self.__condition = threading.Condition()
+        self.__thread = None
+        self.__running = False
+        self.__quit_requested = False
+        self.__latest = None
+        self.__sequence = 0
+
+    def start(self):
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__display, daemon=True)
+        self.__thread.start()
+
+        return self
+
+    def show(self, frame, detection_result, batched, drawing=None):
+        # Without a frame the latest published one is shown. A drawing,
+        # (corners, poses, cam_mtx, dist), is done here for frames tracking
+        # did not draw itself. Results not shown yet are replaced, never queued.
+        with self.__condition:
+            self.__latest = (frame, detection_result, batched, drawing)
+            self.__sequence += 1
+            self.__condition.notify_all()
+
+    def quit_requested(self):
+        return self.__quit_requested
+
+    def stop(self):
+        with self.__condition:
+            self.__running = False
+            self.__condition.notify_all()
+
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def __display(self):
+        # Every GUI call happens on this thread, HighGUI needs that.
+        window_created = False
+        shown_sequence = 0
+        while True:
+            with self.__condition:
+                self.__condition.wait_for(
+                    lambda: self.__sequence != shown_sequence or not self.__running, self.__frame_interval)
+                if not self.__running:
+                    break
+
+                latest = self.__latest if self.__sequence != shown_sequence else None
+                shown_sequence = self.__sequence
+
+            start = time.perf_counter()
+            if latest is not None:
+                frame, detection_result, batched, drawing = latest
+                if frame is None:
+                    frame = self.__published_frame()
+                elif drawing is not None:
+                    draw_detection(frame, *drawing)
+
+                if frame is not None:
+                    if not window_created:
+                        cv2.namedWindow(WINDOW_NAME, cv2.WND_PROP_FULLSCREEN)
+                        cv2.setWindowProperty(
+                            WINDOW_NAME, cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
+                        window_created = True
+
+                    if self.__flip_video:
+                        frame = cv2.flip(frame, 1)
+                    self.__draw_overlay(frame, detection_result, batched)
+                    cv2.imshow(WINDOW_NAME, frame)
+
+            if window_created:
+                # Also caps the rate, newer results wait in __latest meanwhile.
+                wait = self.__frame_interval - (time.perf_counter() - start)
+                if cv2.waitKey(max(1, int(wait * 1000))) & 0xFF == ord('q'):
+                    self.__quit_requested = True
+
+        if window_created:
+            cv2.destroyWindow(WINDOW_NAME)
+            cv2.waitKey(1)
+
+    def __published_frame(self):
+        sequence, frame, _ = self.__frame_ring.latest()
+        if frame is None:
+            return None
+
+        frame = frame.copy()
+        if not self.__frame_ring.is_valid(sequence):
+            return None
+
+        return frame
+
+    def __draw_overlay(self, frame, detection_result, batched):
+        font = cv2.FONT_HERSHEY_SIMPLEX
+        font_scale = 0.6
+        font_color = (0, 255, 0)
+
+        cv2.putText(frame, 'timestamp: {}'.format(detection_result['timestamp']), (0, 20),
+                    font, font_scale, font_color, 2, cv2.LINE_AA)
+        if batched:
+            line = 40
+            for target_id, target_result in detection_result['targets'].items():
+                if target_result['success']:
+                    text = '{}: {:.2f} {:.2f} {:.2f}'.format(
+                        target_id, target_result['translation_x'], target_result['translation_y'], target_result['translation_z'])
+                else:
+                    text = '{}: not found'.format(target_id)
+                cv2.putText(frame, text, (0, line),
+                            font, font_scale, font_color, 2, cv2.LINE_AA)
+                line += 20
+        else:
+            cv2.putText(frame, 'success: {}'.format(detection_result['success']), (0, 40),
+                        font, font_scale, font_color, 2, cv2.LINE_AA)
+
+            if detection_result['success'] == 1:
+                cv2.putText(frame, 'translation_x: {:.2f}'.format(detection_result['translation_x']), (0, 60),
+                            font, font_scale, font_color, 2, cv2.LINE_AA)     
+                cv2.putText(frame, 'translation_y: {:.2f}'.format(detection_result['translation_y']), (0, 80),
+                            font, font_scale, font_color, 2, cv2.LINE_AA)
+                cv2.putText(frame, 'translation_z: {:.2f}'.format(detection_result['translation_z']), (0, 100),
+                            font, font_scale, font_color, 2, cv2.LINE_AA)
+                cv2.putText(frame, 'rotation_right_x: {:.2f}'.format(detection_result['rotation_right_x']), (0, 120),
+                            font, font_scale, font_color, 2, cv2.LINE_AA)
+                cv2.putText(frame, 'rotation_right_y: {:.2f}'.format(detection_result['rotation_right_y']), (0, 140),
+                            font, font_scale, font_color, 2, cv2.LINE_AA)
+                cv2.putText(frame, 'rotation_right_z: {:.2f}'.format(detection_result['rotation_right_z']), (0, 160),
+                            font, font_scale, font_color, 2, cv2.LINE_AA)
+                cv2.putText(frame, 'rotation_up_x: {:.2f}'.format(detection_result['rotation_up_x']), (0, 180),
+                            font, font_scale, font_color, 2, cv2.LINE_AA)
+                cv2.putText(frame, 'rotation_up_y: {:.2f}'.format(detection_result['rotation_up_y']), (0, 200),
+                            font, font_scale, font_color, 2, cv2.LINE_AA)
+                cv2.putText(frame, 'rotation_up_z: {:.2f}'.format(detection_result['rotation_up_z']), (0, 220),
+                            font, font_scale, font_color, 2, cv2.LINE_AA)
+                cv2.putText(frame, 'rotation_forward_x: {:.2f}'.format(detection_result['rotation_forward_x']), (0, 240),
+                            font, font_scale, font_color, 2, cv2.LINE_AA)
+                cv2.putText(frame, 'rotation_forward_y: {:.2f}'.format(detection_result['rotation_forward_y']), (0, 260),
+                            font, font_scale, font_color, 2, cv2.LINE_AA)
+                cv2.putText(frame, 'rotation_forward_z: {:.2f}'.format(detection_result['rotation_forward_z']), (0, 280),
+                            font, font_scale, font_color, 2, cv2.LINE_AA)
+
+        gauges = self.__metrics.gauges()
+        cv2.putText(frame, 'detection_scale: {:.2f}'.format(gauges['detection_scale']), (0, 305),
+                    font, font_scale, font_color, 2, cv2.LINE_AA)
+        cv2.putText(frame, 'video_subscribers: {}'.format(gauges['video_subscribers']), (0, 330),
+                    font, font_scale, font_color, 2, cv2.LINE_AA)
+
+        cv2.putText(frame, "Q - Quit ", (0, 355), font,
+                    font_scale, font_color, 2, cv2.LINE_AA)
+
+
+def draw_detection(frame, corners, poses, cam_mtx, dist):
+    aruco.drawDetectedMarkers(frame, corners)
+
+    for rvec, tvec in poses.values():
+        if rvec is not None and tvec is not None:
+            aruco.drawAxis(frame, cam_mtx, dist, rvec, tvec, 5)
@@ -4,10 +4,14 @@ except ModuleNotFoundError:
     import pickle
 
 import os
-import glob
+import time
 import cv2
 import numpy as np
-import cv2.aruco as aruco
+from marker_detection import MarkerDetectionEngine
+from frame_capture import open_video_capture
+
+SELECTED_CAM_MTX_PATH = '../assets/configs/selected_cam_mtx.npy'
+SELECTED_DIST_PATH = '../assets/configs/selected_dist.npy'
 
 
 class VideoSourceCalibration:
@@ -22,6 +26,8 @@ class VideoSourceCalibration:
 
     def calibrate(self):
         win_name = "Video Source Calibration Image Capture"
+        detection_engine = MarkerDetectionEngine.persisted()
+
         cv2.namedWindow(win_name, cv2.WND_PROP_FULLSCREEN)
         cv2.setWindowProperty(
             win_name, cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
@@ -33,7 +39,7 @@ class VideoSourceCalibration:
 
         #Descomentar quando nao for utilizar o DroidCam
         #video_capture = cv2.VideoCapture(self.__video_source, cv2.CAP_DSHOW)
-        video_capture = cv2.VideoCapture(self.__video_source)
+        video_capture = open_video_capture(self.__video_source)
 
         video_capture.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
         video_capture.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
@@ -45,9 +51,14 @@ class VideoSourceCalibration:
         while True:
             option = cv2.waitKey(1)
 
-            _, frame = video_capture.read()
+            captured, frame = video_capture.read()
+            if not captured:
+                # The camera was lost or a replayed recording ended.
+                video_capture.release()
+                cv2.destroyAllWindows()
+                break
 
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            gray = detection_engine.grayscale(frame)
 
             cv2.putText(frame, "calibration image count: {}. Minimum 50".format(
                 len(calibration_frames)), (0, 20), font, font_scale, status_color, 2, cv2.LINE_AA)
@@ -59,7 +70,7 @@ class VideoSourceCalibration:
                 found, _ = cv2.findChessboardCorners(gray, (9, 6), None)
 
                 if found:
-                    calibration_frames.append(gray)
+                    calibration_frames.append(gray.copy())
 
             if ready_to_calibrate:
                 cv2.putText(frame, "C - Start Calibration", (0, 60),
@@ -133,6 +144,8 @@ class VideoSourceCalibration:
 
     def test(self):
         win_name = "Calibration Test Image Capture"
+        detection_engine = MarkerDetectionEngine.persisted()
+
         cv2.namedWindow(win_name, cv2.WND_PROP_FULLSCREEN)
         cv2.setWindowProperty(
             win_name, cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
@@ -147,7 +160,7 @@ class VideoSourceCalibration:
         #else:
         #    video_capture = cv2.VideoCapture(self.__video_source, cv2.CAP_DSHOW)
         
-        video_capture = cv2.VideoCapture(self.__video_source)
+        video_capture = open_video_capture(self.__video_source)
 
         video_capture.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
         video_capture.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
@@ -159,9 +172,14 @@ class VideoSourceCalibration:
         while True:
             option = cv2.waitKey(1)
 
-            _, frame = video_capture.read()
+            captured, frame = video_capture.read()
+            if not captured:
+                # The camera was lost or a replayed recording ended.
+                video_capture.release()
+                cv2.destroyAllWindows()
+                break
 
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            gray = detection_engine.grayscale(frame)
 
             cv2.putText(frame, "test image count: {}. Minimum 10".format(
                 len(calibration_frames)), (0, 20), font, font_scale, status_color, 2, cv2.LINE_AA)
@@ -173,7 +191,7 @@ class VideoSourceCalibration:
                 found, _ = cv2.findChessboardCorners(gray, (9, 6), None)
 
                 if found:
-                    calibration_frames.append(gray)
+                    calibration_frames.append(gray.copy())
 
             if ready_to_test:
                 cv2.putText(frame, "C - Start Test", (0, 60),
@@ -271,3 +289,48 @@ class VideoSourceCalibrationConfig:
             pickle.dump({
                 'chessboard_square_size': self.chessboard_square_size,
                 'score': score}, output, pickle.HIGHEST_PROTOCOL)
+
+
+class CalibrationStore:
+
+    def __init__(self, cam_mtx_path=SELECTED_CAM_MTX_PATH, dist_path=SELECTED_DIST_PATH, check_interval=1.0):
+        self.__cam_mtx_path = cam_mtx_path
+        self.__dist_path = dist_path
+        self.__check_interval = check_interval
+        self.__cam_mtx = None
+        self.__dist = None
+        self.__mtimes = None
+        self.__last_check = None
+        self.reload()
+
+    def camera_parameters(self):
+        if time.monotonic() - self.__last_check >= self.__check_interval:
+            self.reload()
+
+        return self.__cam_mtx, self.__dist
+
+    def reload(self, force=False):
+        # Only stats the files, they are loaded again when the GUI saved a new selection.
+        self.__last_check = time.monotonic()
+
+        try:
+            mtimes = (os.stat(self.__cam_mtx_path).st_mtime_ns,
+                      os.stat(self.__dist_path).st_mtime_ns)
+        except FileNotFoundError:
+            return False
+
+        if mtimes == self.__mtimes and not force:
+            return False
+
+        try:
+            cam_mtx = np.load(self.__cam_mtx_path)
+            dist = np.load(self.__dist_path)
+        except (OSError, ValueError, EOFError):
+            # Caught in the middle of a save, the next check picks it up.
+            return False
+
+        self.__cam_mtx = cam_mtx
+        self.__dist = dist
+        self.__mtimes = mtimes
+
+        return True
@@ -0,0 +1,97 @@
+import random
+import struct
+import time
+
+VIDEO_CHUNK_MAGIC = b'VCHK'
+
+# Little endian: magic, session id, frame id, chunk index, chunk count.
+# Every chunker picks a new session id, and numbers its frames from 1.
+CHUNK_HEADER = struct.Struct('<4sIIHH')
+
+# Keeps every datagram within a typical network MTU, so a lost IP fragment
+# never takes a whole frame with it.
+MAX_CHUNK_PAYLOAD = 1400
+
+# Frames still incomplete this long after their first chunk are dropped.
+REASSEMBLY_DEADLINE = 0.1
+
+
+class FrameChunker:
+
+    def __init__(self, max_chunk_payload=MAX_CHUNK_PAYLOAD):
+        self.__max_chunk_payload = max_chunk_payload
+        self.__session_id = random.getrandbits(32)
+        self.__frame_id = 0
+
+    def chunks(self, encoded_frame):
+        self.__frame_id = (self.__frame_id + 1) & 0xFFFFFFFF
+        chunk_count = max(1, -(-len(encoded_frame) // self.__max_chunk_payload))
+        if chunk_count > 0xFFFF:
+            raise ValueError("Frame of {} bytes needs more than {} chunks".format(len(encoded_frame), 0xFFFF))
+
+        encoded_frame = memoryview(encoded_frame)
+        for chunk_index in range(chunk_count):
+            start = chunk_index * self.__max_chunk_payload
+            yield CHUNK_HEADER.pack(VIDEO_CHUNK_MAGIC, self.__session_id, self.__frame_id, chunk_index, chunk_count) + \
+                encoded_frame[start:start + self.__max_chunk_payload]
+
+
+class FrameReassembler:
+
+    def __init__(self, deadline=REASSEMBLY_DEADLINE):
+        self.__deadline = deadline
+        # Frame id to [first chunk time, chunks, received chunks count].
+        self.__frames = {}
+        self.__session_id = None
+        self.__last_frame_id = None
+        self.dropped_frames = 0
+
+    def add(self, datagram, now=None):
+        # Returns (frame id, encoded frame) once every chunk of a frame arrived.
+        if now is None:
+            now = time.monotonic()
+        self.__expire(now)
+
+        _, session_id, frame_id, chunk_index, chunk_count = CHUNK_HEADER.unpack_from(datagram)
+        if session_id != self.__session_id:
+            # A restarted publisher numbers its frames from 1 again.
+            self.dropped_frames += len(self.__frames)
+            self.__frames = {}
+            self.__session_id = session_id
+            self.__last_frame_id = None
+
+        if self.__last_frame_id is not None and frame_id <= self.__last_frame_id:
+            # Older than a frame already handed out.
+            return None
+
+        frame = self.__frames.get(frame_id)
+        if frame is None:
+            frame = [now, [None] * chunk_count, 0]
+            self.__frames[frame_id] = frame
+
+        chunks = frame[1]
+        if chunk_index >= len(chunks) or chunks[chunk_index] is not None:
+            return None
+
+        chunks[chunk_index] = datagram[CHUNK_HEADER.size:]
+        frame[2] += 1
+        if frame[2] < len(chunks):
+            return None
+
+        del self.__frames[frame_id]
+        self.__last_frame_id = frame_id
+        # Whatever is still pending is older and would be shown out of order.
+        for pending_frame_id in [pending for pending in self.__frames if pending < frame_id]:
+            del self.__frames[pending_frame_id]
+            self.dropped_frames += 1
+
+        return frame_id, b''.join(chunks)
+
+    def __expire(self, now):
+        for frame_id in [frame_id for frame_id, frame in self.__frames.items() if now - frame[0] > self.__deadline]:
+            del self.__frames[frame_id]
+            self.dropped_frames += 1
+
+
+def is_video_chunk(data):
+    return len(data) >= CHUNK_HEADER.size and data[:4] == VIDEO_CHUNK_MAGIC
@@ -0,0 +1,95 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from publishing import AdaptiveBitrateController, BITRATE_HOLD_FRAMES, JPEG_QUALITY, JPEG_QUALITY_STEP, \
+    MIN_JPEG_QUALITY, MIN_VIDEO_SCALE, VIDEO_SCALE_STEP  # noqa: E402
+
+FRAME_INTERVAL = 1 / 30
+# 3 MB/s, 100 KB frames at 30 fps.
+BANDWIDTH_BUDGET = 3000000
+
+
+class AdaptiveBitrateControllerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+
+    def run_frames(self, controller, frames, frame_size=50000, encode_time=0.001, send_time=0.0, drop_ratio=0.0):
+        settings = []
+        for _ in range(frames):
+            self.now += FRAME_INTERVAL
+            controller.update(frame_size, encode_time, send_time, now=self.now, drop_ratio=drop_ratio)
+            settings.append((controller.quality, controller.scale))
+
+        return settings
+
+    def test_disabled_without_budgets(self):
+        controller = AdaptiveBitrateController()
+        self.run_frames(controller, 100, frame_size=10 ** 7, send_time=1.0, drop_ratio=1.0)
+
+        self.assertEqual((controller.quality, controller.scale), (JPEG_QUALITY, 1.0))
+
+    def test_steps_quality_then_scale_down_under_load(self):
+        controller = AdaptiveBitrateController(bandwidth_budget=BANDWIDTH_BUDGET)
+        settings = self.run_frames(controller, 400, frame_size=200000)
+
+        # One step at a time, each held for BITRATE_HOLD_FRAMES frames.
+        changes = [index for index in range(1, len(settings)) if settings[index] != settings[index - 1]]
+        self.assertTrue(all(later - earlier == BITRATE_HOLD_FRAMES + 1 for earlier, later in zip(changes, changes[1:])))
+
+        expected = [(quality, 1.0) for quality in range(JPEG_QUALITY, MIN_JPEG_QUALITY - 1, -JPEG_QUALITY_STEP)]
+        scale = 1.0
+        while scale > MIN_VIDEO_SCALE:
+            scale -= VIDEO_SCALE_STEP
+            expected.append((MIN_JPEG_QUALITY, scale))
+        self.assertEqual([settings[0]] + [settings[index] for index in changes], expected)
+        self.assertEqual(settings[-1], (MIN_JPEG_QUALITY, MIN_VIDEO_SCALE))
+
+    def test_steps_back_up_once_under_the_headroom(self):
+        controller = AdaptiveBitrateController(bandwidth_budget=BANDWIDTH_BUDGET)
+        self.run_frames(controller, 400, frame_size=200000)
+
+        settings = self.run_frames(controller, 400, frame_size=10000)
+        changes = [settings[index] for index in range(1, len(settings)) if settings[index] != settings[index - 1]]
+        # Resolution first, then quality.
+        self.assertEqual(changes[0], (MIN_JPEG_QUALITY, MIN_VIDEO_SCALE + VIDEO_SCALE_STEP))
+        self.assertEqual(changes[3], (MIN_JPEG_QUALITY, 1.0))
+        self.assertEqual(changes[4], (MIN_JPEG_QUALITY + JPEG_QUALITY_STEP, 1.0))
+        self.assertEqual(settings[-1], (JPEG_QUALITY, 1.0))
+
+    def test_stays_between_the_headroom_and_the_budget(self):
+        controller = AdaptiveBitrateController(bandwidth_budget=BANDWIDTH_BUDGET)
+        # 80% of the budget.
+        self.run_frames(controller, 200, frame_size=80000)
+
+        self.assertEqual((controller.quality, controller.scale), (JPEG_QUALITY, 1.0))
+
+    def test_encode_time_budget(self):
+        controller = AdaptiveBitrateController(encode_time_budget=0.01)
+        self.run_frames(controller, 10, encode_time=0.02)
+
+        self.assertEqual(controller.quality, JPEG_QUALITY - JPEG_QUALITY_STEP)
+
+    def test_slow_sends(self):
+        controller = AdaptiveBitrateController(bandwidth_budget=BANDWIDTH_BUDGET)
+        self.run_frames(controller, 10, send_time=2 * FRAME_INTERVAL)
+
+        self.assertEqual(controller.quality, JPEG_QUALITY - JPEG_QUALITY_STEP)
+
+    def test_dropped_datagrams(self):
+        # The bandwidth is well within budget, only the drops show the link
+        # is saturated.
+        controller = AdaptiveBitrateController(bandwidth_budget=BANDWIDTH_BUDGET)
+        self.run_frames(controller, 10, drop_ratio=0.1)
+        self.assertEqual(controller.quality, JPEG_QUALITY - JPEG_QUALITY_STEP)
+
+        controller = AdaptiveBitrateController(bandwidth_budget=BANDWIDTH_BUDGET)
+        self.run_frames(controller, 10, drop_ratio=0.01)
+        self.assertEqual(controller.quality, JPEG_QUALITY)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import asyncio
+import os
+import queue
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from broadcast import AsyncQueueBridge, BroadcastHub  # noqa: E402
+from publishing import send_latest_values  # noqa: E402
+
+
+class FakeWebsocket:
+
+    def __init__(self, send_time=0.0):
+        self.send_time = send_time
+        self.sent = []
+        self.closed = asyncio.Event()
+
+    async def send(self, value):
+        await asyncio.sleep(self.send_time)
+        self.sent.append(value)
+
+    async def wait_closed(self):
+        await self.closed.wait()
+
+
+class BroadcastHubTest(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def test_slow_subscriber_only_sees_the_latest_value(self):
+        async def run():
+            hub = BroadcastHub()
+            fast_slot = hub.subscribe()
+            slow_slot = hub.subscribe()
+
+            fast_values = []
+            for value in range(5):
+                hub.publish(value)
+                fast_values.append(await fast_slot.get())
+
+            return fast_values, await slow_slot.get()
+
+        fast_values, slow_value = self.loop.run_until_complete(run())
+        self.assertEqual(fast_values, list(range(5)))
+        self.assertEqual(slow_value, 4)
+
+    def test_slow_client_never_holds_back_the_others(self):
+        async def run():
+            hub = BroadcastHub()
+            fast_websocket = FakeWebsocket()
+            slow_websocket = FakeWebsocket(send_time=0.2)
+            clients = [asyncio.ensure_future(send_latest_values(hub, websocket))
+                       for websocket in (fast_websocket, slow_websocket)]
+            await asyncio.sleep(0)
+
+            for value in range(10):
+                hub.publish(value)
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.3)
+
+            for websocket in (fast_websocket, slow_websocket):
+                websocket.closed.set()
+            await asyncio.gather(*clients)
+
+            return fast_websocket.sent, slow_websocket.sent, hub.clients()
+
+        fast_sent, slow_sent, clients = self.loop.run_until_complete(run())
+        self.assertEqual(fast_sent, list(range(10)))
+        self.assertEqual(slow_sent, [0, 9])
+        self.assertEqual(clients, 0)
+
+    def test_closed_client_is_removed_without_a_new_value(self):
+        async def run():
+            hub = BroadcastHub()
+            websocket = FakeWebsocket()
+            client = asyncio.ensure_future(send_latest_values(hub, websocket))
+            await asyncio.sleep(0)
+            subscribed = hub.clients()
+
+            websocket.closed.set()
+            await asyncio.wait_for(client, 1.0)
+
+            return subscribed, hub.clients()
+
+        self.assertEqual(self.loop.run_until_complete(run()), (1, 0))
+
+
+class AsyncQueueBridgeTest(unittest.TestCase):
+
+    def test_items_reach_the_loop_in_order(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        items = queue.Queue()
+        received = []
+
+        async def run():
+            done = asyncio.Event()
+
+            def callback(item):
+                received.append(item)
+                if len(received) == 3:
+                    done.set()
+
+            AsyncQueueBridge(items).start(loop, callback)
+            for item in ('a', 'b', 'c'):
+                items.put(item)
+            await asyncio.wait_for(done.wait(), 1.0)
+
+        loop.run_until_complete(run())
+        self.assertEqual(received, ['a', 'b', 'c'])
+
+
+if __name__ == '__main__':
+    unittest.main()
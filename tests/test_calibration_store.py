@@ -0,0 +1,96 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from video_source_calibration import CalibrationStore  # noqa: E402
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+
+class CalibrationStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cam_mtx_path = os.path.join(self.directory.name, 'cam_mtx.npy')
+        self.dist_path = os.path.join(self.directory.name, 'dist.npy')
+        self.clock = FakeClock()
+        patcher = mock.patch('video_source_calibration.time.monotonic', self.clock.monotonic)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def save(self, focal_length, mtime_ns):
+        np.save(self.cam_mtx_path, np.eye(3) * focal_length)
+        np.save(self.dist_path, np.zeros((1, 5)))
+        for path in (self.cam_mtx_path, self.dist_path):
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+
+    def focal_length(self, calibration_store):
+        cam_mtx, _ = calibration_store.camera_parameters()
+
+        return None if cam_mtx is None else cam_mtx[0, 0]
+
+    def test_reloads_a_changed_file_once_the_interval_passed(self):
+        self.save(800, 10 ** 9)
+        calibration_store = CalibrationStore(self.cam_mtx_path, self.dist_path)
+        self.assertEqual(self.focal_length(calibration_store), 800)
+
+        self.save(900, 2 * 10 ** 9)
+        self.clock.now += 0.5
+        self.assertEqual(self.focal_length(calibration_store), 800)
+
+        self.clock.now += 0.5
+        self.assertEqual(self.focal_length(calibration_store), 900)
+
+    def test_unchanged_files_are_not_loaded_again(self):
+        self.save(800, 10 ** 9)
+        calibration_store = CalibrationStore(self.cam_mtx_path, self.dist_path)
+
+        with mock.patch('video_source_calibration.np.load', wraps=np.load) as load:
+            for _ in range(5):
+                self.clock.now += 1.0
+                self.assertEqual(self.focal_length(calibration_store), 800)
+            self.assertEqual(load.call_count, 0)
+
+            self.assertTrue(calibration_store.reload(force=True))
+            self.assertEqual(load.call_count, 2)
+
+    def test_files_saved_later(self):
+        calibration_store = CalibrationStore(self.cam_mtx_path, self.dist_path)
+        self.assertEqual(calibration_store.camera_parameters(), (None, None))
+
+        self.save(800, 10 ** 9)
+        self.clock.now += 1.0
+        self.assertEqual(self.focal_length(calibration_store), 800)
+
+    def test_keeps_the_last_parameters_while_a_save_is_incomplete(self):
+        self.save(800, 10 ** 9)
+        calibration_store = CalibrationStore(self.cam_mtx_path, self.dist_path)
+
+        with open(self.cam_mtx_path, 'wb') as file:
+            file.write(b'\x93NUMPY')
+        os.utime(self.cam_mtx_path, ns=(2 * 10 ** 9, 2 * 10 ** 9))
+        self.clock.now += 1.0
+        self.assertEqual(self.focal_length(calibration_store), 800)
+
+        self.save(900, 3 * 10 ** 9)
+        self.clock.now += 1.0
+        self.assertEqual(self.focal_length(calibration_store), 900)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from detection_pipeline import DetectionWorkerPool  # noqa: E402
+
+FRAMES = 20
+
+
+class FakeEstimator:
+
+    def __init__(self, targets, detection_engine_settings, translation_offset):
+        self.stage_times = {}
+
+    def estimate(self, frame, region=None):
+        # The first frame finishes last, every worker gets past it.
+        frame_index = int(frame[0, 0, 0])
+        if frame_index == 1:
+            time.sleep(0.5)
+
+        return (), None, {'frame': frame_index}
+
+
+class FakeFrameCapture:
+
+    def __init__(self, frames):
+        self.__frames = frames
+        self.__lock = threading.Lock()
+        self.reads = 0
+        self.dropped_frames = 0
+
+    def read(self, timeout=None):
+        with self.__lock:
+            if self.reads == self.__frames:
+                return False, None, None
+
+            self.reads += 1
+            frame = np.zeros((4, 4, 3), np.uint8)
+            frame[0, 0, 0] = self.reads
+            return True, frame, float(self.reads)
+
+    def ended(self):
+        with self.__lock:
+            return self.reads == self.__frames
+
+
+class DetectionWorkerPoolTest(unittest.TestCase):
+
+    def test_results_in_frame_order_within_the_in_flight_cap(self):
+        frame_capture = FakeFrameCapture(FRAMES)
+        with mock.patch('detection_pipeline.MarkerPoseEstimator', FakeEstimator):
+            pool = DetectionWorkerPool(2, {}, None, None).start(frame_capture, lambda: None)
+        try:
+            # Nothing is consumed yet, the dispatcher stops at twice the workers.
+            time.sleep(0.3)
+            self.assertEqual(frame_capture.reads, 4)
+
+            results = [pool.next_result()]
+            time.sleep(0.3)
+            self.assertEqual(frame_capture.reads, 5)
+
+            while True:
+                result = pool.next_result()
+                if result is None:
+                    break
+                results.append(result)
+                self.assertLessEqual(frame_capture.reads, len(results) + 4)
+        finally:
+            pool.stop()
+
+        self.assertEqual([capture_timestamp for _, capture_timestamp, _ in results],
+                         [float(frame_index) for frame_index in range(1, FRAMES + 1)])
+        for frame, _, (_, _, poses) in results:
+            self.assertEqual(poses['frame'], frame[0, 0, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
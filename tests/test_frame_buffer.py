@@ -0,0 +1,132 @@
+import os
+import sys
+import time
+import unittest
+from multiprocessing import Event, Process, shared_memory
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from frame_buffer import SharedFrameRing  # noqa: E402
+
+FRAME_SHAPE = (48, 64, 3)
+
+
+def filled_frame(value, shape=FRAME_SHAPE):
+    return np.full(shape, value % 256, dtype=np.uint8)
+
+
+def write_frames(frame_ring, count, stop=None):
+    for sequence in range(1, count + 1):
+        if stop is not None and stop.is_set():
+            break
+        frame_ring.write(filled_frame(sequence), float(sequence))
+
+
+def subscribe_and_write(frame_ring):
+    frame_ring.add_subscribers(2)
+    frame_ring.write(filled_frame(7), 7.0)
+    frame_ring.release()
+
+
+class SharedFrameRingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.frame_ring = SharedFrameRing(slots=3, max_frame_shape=FRAME_SHAPE)
+
+    def tearDown(self):
+        if self.frame_ring is not None:
+            self.frame_ring.release()
+
+    def test_write_and_read(self):
+        self.assertEqual(self.frame_ring.latest(), (0, None, None))
+
+        sequence = self.frame_ring.write(filled_frame(5, (24, 32, 3)), 1.5)
+        frame, timestamp = self.frame_ring.read(sequence)
+        self.assertEqual(frame.shape, (24, 32, 3))
+        self.assertTrue((frame == 5).all())
+        self.assertEqual(timestamp, 1.5)
+        self.assertFalse(frame.flags.writeable)
+        self.assertTrue(self.frame_ring.is_valid(sequence))
+
+        self.assertEqual(self.frame_ring.latest()[0], sequence)
+
+    def test_overwritten_slot_is_invalid(self):
+        sequence = self.frame_ring.write(filled_frame(1), 1.0)
+        frame, _ = self.frame_ring.read(sequence)
+
+        # Three slots, the fourth frame goes where the first was.
+        write_frames(self.frame_ring, 3)
+        self.assertFalse(self.frame_ring.is_valid(sequence))
+        self.assertEqual(self.frame_ring.read(sequence), (None, None))
+        self.assertTrue((frame == 3).all())
+
+    def test_larger_frame_is_scaled_down(self):
+        large_frame = filled_frame(9, (96, 128, 3))
+        self.assertFalse(self.frame_ring.fits(large_frame))
+
+        frame, _ = self.frame_ring.read(self.frame_ring.write(large_frame, 1.0))
+        self.assertLessEqual(frame.size, np.prod(FRAME_SHAPE))
+        self.assertTrue((frame == 9).all())
+
+    def test_wait_times_out(self):
+        self.assertEqual(self.frame_ring.wait(0, timeout=0.01), (0, None, None))
+
+    def test_valid_reads_are_never_torn(self):
+        # A slow reader racing the writer either gets a whole frame or
+        # rejects it, never a mix of two.
+        stop = Event()
+        writer = Process(target=write_frames, args=(self.frame_ring, 10 ** 6, stop), daemon=True)
+        writer.start()
+
+        valid_reads = 0
+        rejected_reads = 0
+        try:
+            while writer.is_alive() and (valid_reads < 10 or rejected_reads < 10) and valid_reads + rejected_reads < 5000:
+                sequence, frame, _ = self.frame_ring.wait(0, timeout=1.0)
+                if frame is None:
+                    continue
+
+                half = FRAME_SHAPE[0] // 2
+                top = frame[:half].copy()
+                time.sleep(0.0005)
+                bottom = frame[half:].copy()
+                if not self.frame_ring.is_valid(sequence):
+                    rejected_reads += 1
+                    continue
+
+                valid_reads += 1
+                self.assertTrue((top == sequence % 256).all())
+                self.assertTrue((bottom == sequence % 256).all())
+        finally:
+            stop.set()
+            writer.join()
+
+        self.assertGreater(valid_reads, 0)
+        self.assertGreater(rejected_reads, 0)
+
+    def test_subscribers_and_frames_are_shared(self):
+        process = Process(target=subscribe_and_write, args=(self.frame_ring,))
+        process.start()
+        process.join()
+
+        self.assertEqual(self.frame_ring.subscribers(), 2)
+        self.frame_ring.add_subscribers(-1)
+        self.assertEqual(self.frame_ring.subscribers(), 1)
+
+        # Released by the other process, still readable here.
+        sequence, frame, timestamp = self.frame_ring.latest()
+        self.assertTrue((frame == 7).all())
+        self.assertEqual(timestamp, 7.0)
+
+    def test_release_unlinks_the_memory(self):
+        name = self.frame_ring._SharedFrameRing__shared_memory.name
+        self.frame_ring.release()
+        self.frame_ring = None
+
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+
+if __name__ == '__main__':
+    unittest.main()
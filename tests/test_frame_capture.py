@@ -0,0 +1,70 @@
+import os
+import sys
+import unittest
+from unittest import mock
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from frame_capture import LatestFrameCapture  # noqa: E402
+
+
+class FakeVideoCapture:
+
+    def __init__(self, opened=True, frames=0):
+        self.__opened = opened
+        self.__frames = frames
+
+    def isOpened(self):
+        return self.__opened
+
+    def set(self, property_id, value):
+        return True
+
+    def read(self):
+        if self.__frames == 0:
+            return False, None
+
+        self.__frames -= 1
+        return True, np.zeros((4, 4, 3), np.uint8)
+
+    def release(self):
+        pass
+
+
+def latest_frame_capture(video_capture):
+    with mock.patch('frame_capture.cv2.VideoCapture', return_value=video_capture):
+        return LatestFrameCapture(0).start()
+
+
+class LatestFrameCaptureTest(unittest.TestCase):
+
+    def test_camera_not_opened(self):
+        with self.assertRaises(IOError):
+            latest_frame_capture(FakeVideoCapture(opened=False))
+
+    def test_camera_without_frames(self):
+        with self.assertRaises(IOError):
+            latest_frame_capture(FakeVideoCapture(frames=0))
+
+    def test_lost_camera(self):
+        frame_capture = latest_frame_capture(FakeVideoCapture(frames=1))
+        captured, frame, _ = frame_capture.read(1.0)
+        self.assertTrue(captured)
+        self.assertEqual(frame.shape, (4, 4, 3))
+
+        self.assertEqual(frame_capture.read(1.0)[0], False)
+        self.assertTrue(frame_capture.ended())
+        self.assertTrue(frame_capture.lost())
+        frame_capture.release()
+
+    def test_release_is_not_a_loss(self):
+        frame_capture = latest_frame_capture(FakeVideoCapture(frames=10 ** 9))
+        self.assertTrue(frame_capture.read(1.0)[0])
+
+        frame_capture.release()
+        self.assertFalse(frame_capture.lost())
+
+
+if __name__ == '__main__':
+    unittest.main()
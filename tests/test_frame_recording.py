@@ -0,0 +1,88 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from frame_recording import FrameRecorder, ReplayFrameCapture, replay_start  # noqa: E402
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class ReplayFrameCaptureTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.clock = FakeClock()
+        patcher = mock.patch('frame_recording.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def record(self, name, timestamps):
+        path = os.path.join(self.directory.name, name + '.frec')
+        recorder = FrameRecorder(path)
+        for index, timestamp in enumerate(timestamps):
+            recorder.write(np.full((4, 4, 3), index, dtype=np.uint8), timestamp)
+        recorder.close()
+
+        return path
+
+    def replay(self, frame_capture):
+        replayed = []
+        while True:
+            captured, frame, timestamp = frame_capture.read()
+            if not captured:
+                break
+            replayed.append((int(frame[0, 0, 0]), timestamp))
+        frame_capture.release()
+
+        return replayed
+
+    def test_replays_with_the_original_timestamps(self):
+        path = self.record('camera', [10.0, 10.1, 10.2])
+
+        frame_capture = ReplayFrameCapture(path, realtime=False).start()
+        self.assertEqual(self.replay(frame_capture), [(0, 10.0), (1, 10.1), (2, 10.2)])
+
+    def test_realtime_replay_starts_now(self):
+        path = self.record('camera', [10.0, 10.1, 10.2])
+
+        replayed = self.replay(ReplayFrameCapture(path).start())
+        self.assertEqual([index for index, _ in replayed], [0, 1, 2])
+        np.testing.assert_allclose([timestamp for _, timestamp in replayed], [1000.0, 1000.1, 1000.2])
+
+    def test_realtime_replays_keep_the_time_between_cameras(self):
+        # The second camera started recording 0.3 seconds after the first.
+        first_path = self.record('first', [10.0, 10.1, 10.2, 10.3, 10.4])
+        second_path = self.record('second', [10.3, 10.4])
+
+        start = replay_start([first_path, 1, second_path])
+        self.assertEqual(start[1], 10.0)
+
+        first = self.replay(ReplayFrameCapture(first_path, start=start).start())
+        self.clock.now = 1000.0
+        second = self.replay(ReplayFrameCapture(second_path, start=start).start())
+
+        np.testing.assert_allclose([timestamp for _, timestamp in first[3:]], [timestamp for _, timestamp in second])
+        self.assertGreaterEqual(first[0][1], 1000.0)
+
+    def test_no_shared_start_without_recordings(self):
+        self.assertIsNone(replay_start([0, 1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
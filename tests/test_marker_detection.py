@@ -0,0 +1,101 @@
+import os
+import sys
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from marker_detection import DetectionEngineSettings, MarkerDetectionEngine, PredictedDetectionRegion  # noqa: E402
+from marker_detection_settings import SingleMarkerDetectionSettings  # noqa: E402
+from synthetic_scene import SyntheticScene  # noqa: E402
+
+FRAME_SHAPE = (720, 1280, 3)
+CAM_MTX = np.array([[900.0, 0.0, 640.0], [0.0, 900.0, 360.0], [0.0, 0.0, 1.0]])
+DIST = np.zeros((1, 5))
+# A 10 unit square, 90 pixels wide at 100 units.
+OBJECT_POINTS = np.array([[-5, 5, 0], [5, 5, 0], [5, -5, 0], [-5, -5, 0]], dtype=np.float64)
+MAX_MISSES = 3
+
+
+def predicted_region(tvec, padding=0.5):
+    detection_region = PredictedDetectionRegion(OBJECT_POINTS, padding, MAX_MISSES)
+    detection_region.predicted(np.eye(3), np.array(tvec, dtype=np.float64), CAM_MTX, DIST, FRAME_SHAPE)
+
+    return detection_region
+
+
+class PredictedDetectionRegionTest(unittest.TestCase):
+
+    def test_padded_region_around_the_projection(self):
+        x, y, width, height = predicted_region([0, 0, 100]).region()
+
+        # 90 pixels around the center, padded by 45 on each side.
+        self.assertAlmostEqual(x, 640 - 45 - 45, delta=2)
+        self.assertAlmostEqual(y, 360 - 45 - 45, delta=2)
+        self.assertAlmostEqual(width, 180, delta=3)
+        self.assertAlmostEqual(height, 180, delta=3)
+
+    def test_clamped_to_the_top_left_edges(self):
+        # Centered on the top left corner of the frame.
+        x, y, width, height = predicted_region([-640 / 9, -40, 100]).region()
+
+        self.assertEqual((x, y), (0, 0))
+        self.assertAlmostEqual(width, 90, delta=3)
+        self.assertAlmostEqual(height, 90, delta=3)
+
+    def test_clamped_to_the_bottom_right_edges(self):
+        x, y, width, height = predicted_region([640 / 9, 40, 100]).region()
+
+        self.assertEqual((x + width, y + height), (FRAME_SHAPE[1], FRAME_SHAPE[0]))
+        self.assertAlmostEqual(width, 90, delta=3)
+        self.assertAlmostEqual(height, 90, delta=3)
+
+    def test_no_region_outside_the_frame(self):
+        self.assertIsNone(predicted_region([200, 0, 100]).region())
+        self.assertIsNone(predicted_region([0, 0, -100]).region())
+
+    def test_full_frame_after_the_max_misses(self):
+        detection_region = predicted_region([0, 0, 100])
+        region = detection_region.region()
+
+        for _ in range(MAX_MISSES - 1):
+            detection_region.missed()
+            self.assertEqual(detection_region.region(), region)
+
+        detection_region.missed()
+        self.assertIsNone(detection_region.region())
+
+    def test_a_detection_resets_the_misses(self):
+        detection_region = predicted_region([0, 0, 100])
+        for _ in range(MAX_MISSES - 1):
+            detection_region.missed()
+
+        detection_region.predicted(np.eye(3), np.array([0, 0, 100], dtype=np.float64), CAM_MTX, DIST, FRAME_SHAPE)
+        for _ in range(MAX_MISSES - 1):
+            detection_region.missed()
+        self.assertIsNotNone(detection_region.region())
+
+
+class MarkerDetectionEngineTest(unittest.TestCase):
+
+    def test_region_corners_are_in_frame_coordinates(self):
+        scene = SyntheticScene(FRAME_SHAPE[1], FRAME_SHAPE[0])
+        pose = np.eye(4)
+        pose[:3, :3] = np.diag([1.0, -1.0, -1.0])
+        pose[:3, 3] = (20, -10, 80)
+        frame = scene.render([(SingleMarkerDetectionSettings(13.2, 0), pose)])
+
+        detection_engine = MarkerDetectionEngine(DetectionEngineSettings.from_data({}))
+        full_frame_corners, full_frame_ids = detection_engine.detect(frame)
+        self.assertEqual(len(full_frame_corners), 1)
+
+        x0, y0 = np.floor(full_frame_corners[0].reshape(-1, 2).min(axis=0)).astype(int) - 40
+        x1, y1 = np.ceil(full_frame_corners[0].reshape(-1, 2).max(axis=0)).astype(int) + 40
+        corners, ids = detection_engine.detect(frame, (x0, y0, x1 - x0, y1 - y0))
+
+        self.assertEqual(ids.tolist(), full_frame_ids.tolist())
+        np.testing.assert_allclose(corners[0], full_frame_corners[0], atol=0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import sys
+import unittest
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from tracking import create_kalman_filter  # noqa: E402
+from pose_filter import ConstantAccelerationFilter, QuaternionPoseFilter  # noqa: E402
+
+DELTA_TIME = 0.0334
+
+
+def rotation(axis, degrees):
+    rot_mtx, _ = cv2.Rodrigues(np.asarray(axis, dtype=float) * np.radians(degrees))
+
+    return rot_mtx
+
+
+def angle_between(first, second):
+    return np.degrees(np.linalg.norm(cv2.Rodrigues(np.dot(first.T, second))[0]))
+
+
+def noisy_trajectory(updates):
+    # A target moving and turning smoothly, as in filter_benchmark.py.
+    random = np.random.RandomState(0)
+    times = np.arange(updates) * DELTA_TIME
+
+    return np.stack([
+        10 * np.sin(times), 5 * np.cos(0.5 * times), 80 + times,
+        0.3 * np.sin(times), 0.2 * np.cos(times), 0.1 * times], axis=1) + random.normal(0, 0.05, (updates, 6))
+
+
+class ConstantAccelerationFilterTest(unittest.TestCase):
+
+    def test_transition_matches_opencv_filter(self):
+        np.testing.assert_array_equal(ConstantAccelerationFilter(DELTA_TIME).transitionMatrix,
+                                      create_kalman_filter(18, 6, DELTA_TIME).transitionMatrix)
+
+    def test_states_match_opencv_filter(self):
+        opencv_filter = create_kalman_filter(18, 6, DELTA_TIME)
+        constant_acceleration_filter = ConstantAccelerationFilter(DELTA_TIME)
+
+        for measurement in noisy_trajectory(2000):
+            opencv_filter.predict()
+            opencv_state = opencv_filter.correct(measurement.reshape(6, 1))
+            constant_acceleration_filter.predict()
+            state = constant_acceleration_filter.correct(measurement)
+
+            np.testing.assert_allclose(state, opencv_state, rtol=0, atol=1e-6)
+
+
+class QuaternionPoseFilterTest(unittest.TestCase):
+
+    def test_converges_to_a_constant_pose(self):
+        pose_filter = QuaternionPoseFilter(DELTA_TIME)
+        pose_filter.update(np.zeros(3), rotation((1, 0, 0), 0))
+
+        target = rotation((0, 1, 1) / np.sqrt(2), 60)
+        for _ in range(400):
+            translation, rot_mtx = pose_filter.update(np.array([10.0, -5.0, 80.0]), target)
+
+        np.testing.assert_allclose(translation, (10.0, -5.0, 80.0), atol=1e-3)
+        self.assertLess(angle_between(rot_mtx, target), 0.01)
+        np.testing.assert_allclose(np.dot(rot_mtx, rot_mtx.T), np.eye(3), atol=1e-9)
+
+    def test_turning_through_a_quaternion_sign_flip(self):
+        # Measured quaternions jump to the opposite hemisphere at 240 degrees
+        # around z, the filter still follows a smooth turn.
+        pose_filter = QuaternionPoseFilter(DELTA_TIME)
+        for step in range(80):
+            target = rotation((0, 0, 1), 170 + step * 1.5)
+            _, rot_mtx = pose_filter.update(np.zeros(3), target)
+            self.assertLess(angle_between(rot_mtx, target), 1.0)
+
+    def test_measurements_on_both_sides_of_a_sign_flip(self):
+        pose_filter = QuaternionPoseFilter(DELTA_TIME)
+        for step in range(60):
+            _, rot_mtx = pose_filter.update(np.zeros(3), rotation((0, 0, 1), 239 if step % 2 else 241))
+
+        self.assertLess(angle_between(rot_mtx, rotation((0, 0, 1), 240)), 0.5)
+
+if __name__ == '__main__':
+    unittest.main()
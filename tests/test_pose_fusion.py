@@ -0,0 +1,93 @@
+import os
+import sys
+import unittest
+from unittest import mock
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from multi_camera import PoseFusion  # noqa: E402
+
+
+def pose(x):
+    target_pose = np.eye(4)
+    target_pose[:3, 3] = (x, 0.0, 0.0)
+
+    return target_pose
+
+
+class PoseFusionTest(unittest.TestCase):
+
+    def test_waits_for_every_camera(self):
+        fusion = PoseFusion(2, fusion_window=0.01, fusion_timeout=60)
+        fusion.add(0, 1.0, {'a': pose(1.0)})
+        self.assertIsNone(fusion.fuse())
+
+        fusion.add(1, 1.005, {'a': pose(3.0)})
+        capture_timestamp, poses = fusion.fuse()
+        self.assertEqual(capture_timestamp, 1.005)
+        np.testing.assert_allclose(poses['a'], pose(2.0), atol=1e-9)
+
+    def test_matches_capture_timestamps_not_arrival(self):
+        # Camera 0 runs ahead, its later frames must not fuse with the
+        # earlier frames of camera 1.
+        fusion = PoseFusion(2, fusion_window=0.01, fusion_timeout=60)
+        for index in range(3):
+            fusion.add(0, index * 0.1, {'a': pose(index)})
+        fusion.add(1, 0.0, {'a': pose(10.0)})
+        fusion.add(1, 0.1, {'a': pose(11.0)})
+
+        _, poses = fusion.fuse()
+        np.testing.assert_allclose(poses['a'][:3, 3], (5.0, 0.0, 0.0), atol=1e-9)
+        _, poses = fusion.fuse()
+        np.testing.assert_allclose(poses['a'][:3, 3], (6.0, 0.0, 0.0), atol=1e-9)
+        self.assertIsNone(fusion.fuse())
+
+    def test_outside_window_is_fused_alone(self):
+        fusion = PoseFusion(2, fusion_window=0.01, fusion_timeout=60)
+        fusion.add(0, 1.0, {'a': pose(1.0)})
+        fusion.add(1, 1.5, {'b': pose(2.0)})
+
+        capture_timestamp, poses = fusion.fuse()
+        self.assertEqual((capture_timestamp, list(poses)), (1.0, ['a']))
+
+    def test_late_measurement_is_dropped(self):
+        fusion = PoseFusion(2, fusion_window=0.01, fusion_timeout=0)
+        fusion.add(0, 2.0, {'a': pose(1.0)})
+        self.assertEqual(fusion.fuse()[0], 2.0)
+
+        fusion.add(1, 1.0, {'a': pose(2.0)})
+        self.assertIsNone(fusion.fuse())
+
+    def test_camera_missing_the_deadline_is_dropped(self):
+        fusion = PoseFusion(2, fusion_window=0.01, fusion_timeout=0.1)
+        with mock.patch('multi_camera.time.time', return_value=100.0):
+            fusion.add(0, 1.0, {'a': pose(1.0)})
+        self.assertEqual(fusion.deadline(), 100.1)
+
+        with mock.patch('multi_camera.time.time', return_value=100.05):
+            self.assertIsNone(fusion.fuse())
+
+        with mock.patch('multi_camera.time.time', return_value=100.2):
+            capture_timestamp, poses = fusion.fuse()
+            self.assertEqual(capture_timestamp, 1.0)
+            np.testing.assert_allclose(poses['a'], pose(1.0), atol=1e-9)
+
+            # Arriving after its instant was fused, it no longer holds it back.
+            fusion.add(1, 1.0, {'a': pose(3.0)})
+            self.assertIsNone(fusion.fuse())
+            self.assertIsNone(fusion.deadline())
+
+    def test_ended_camera_is_not_waited_for(self):
+        fusion = PoseFusion(2, fusion_window=0.01, fusion_timeout=60)
+        fusion.end_camera(1)
+        fusion.add(0, 1.0, {'a': pose(1.0)})
+        self.assertFalse(fusion.finished())
+
+        self.assertEqual(fusion.fuse()[0], 1.0)
+        fusion.end_camera(0)
+        self.assertTrue(fusion.finished())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from pose_packet import HEADER, POSE_KEYS, TARGET, PosePacketEncoder, decode_pose_packet, is_pose_packet  # noqa: E402
+
+
+def detection_result(offset):
+    result = {key: offset + index * 0.5 for index, key in enumerate(POSE_KEYS)}
+    result['success'] = 1
+
+    return result
+
+
+class PosePacketTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        found = detection_result(1.0)
+        lost = {'success': 0}
+        packet = PosePacketEncoder(2).encode(42, 10.25, 10.5, [found, lost])
+
+        self.assertTrue(is_pose_packet(packet))
+        self.assertEqual(len(packet), HEADER.size + 2 * TARGET.size)
+
+        decoded = decode_pose_packet(packet)
+        self.assertEqual(decoded['sequence'], 42)
+        self.assertEqual(decoded['capture_timestamp'], 10.25)
+        self.assertEqual(decoded['timestamp'], 10.5)
+        self.assertEqual(len(decoded['targets']), 2)
+
+        first, second = decoded['targets']
+        self.assertEqual(first['target_index'], 0)
+        self.assertTrue(first['success'])
+        for key in POSE_KEYS:
+            self.assertEqual(first[key], found[key])
+        self.assertEqual(second, {'target_index': 1, 'success': False})
+
+    def test_encoder_reuses_its_buffer(self):
+        encoder = PosePacketEncoder(1)
+        first = encoder.encode(1, 0.0, 0.0, [detection_result(1.0)])
+        encoder.encode(2, 0.0, 0.0, [detection_result(2.0)])
+
+        self.assertEqual(decode_pose_packet(first)['targets'][0]['translation_x'], 1.0)
+
+    def test_rejects_other_data(self):
+        self.assertFalse(is_pose_packet(b'{"success": 0}'))
+        with self.assertRaises(ValueError):
+            decode_pose_packet(b'VCHK' + bytes(HEADER.size - 4))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import sys
+import unittest
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from rotations import rotation_matrix_to_quaternion, quaternion_to_rotation_matrix, average_quaternions, \
+    quaternion_multiply, quaternion_conjugate, quaternion_to_rotation_vector, rotation_vector_to_quaternion  # noqa: E402
+
+
+def random_rotation_vectors(count):
+    random = np.random.RandomState(0)
+    axes = random.normal(size=(count, 3))
+    axes /= np.linalg.norm(axes, axis=1, keepdims=True)
+
+    return axes * random.uniform(0, np.pi * 0.999, (count, 1))
+
+
+class RotationsTest(unittest.TestCase):
+
+    def test_rotation_vector_round_trip(self):
+        for rotation_vector in random_rotation_vectors(200):
+            np.testing.assert_allclose(
+                quaternion_to_rotation_vector(rotation_vector_to_quaternion(rotation_vector)), rotation_vector, atol=1e-9)
+
+    def test_rotation_matrix_round_trip(self):
+        # Covers every branch of rotation_matrix_to_quaternion.
+        for rotation_vector in random_rotation_vectors(200):
+            rot_mtx, _ = cv2.Rodrigues(rotation_vector)
+            quaternion = rotation_matrix_to_quaternion(rot_mtx)
+
+            np.testing.assert_allclose(quaternion_to_rotation_matrix(quaternion), rot_mtx, atol=1e-9)
+            np.testing.assert_allclose(quaternion_to_rotation_vector(quaternion), rotation_vector, atol=1e-6)
+
+    def test_opposite_quaternions_give_the_same_rotation_vector(self):
+        for rotation_vector in random_rotation_vectors(20):
+            quaternion = rotation_vector_to_quaternion(rotation_vector)
+            np.testing.assert_allclose(quaternion_to_rotation_vector(-quaternion),
+                                       quaternion_to_rotation_vector(quaternion), atol=1e-9)
+
+    def test_relative_rotation_across_a_sign_flip(self):
+        first = rotation_matrix_to_quaternion(cv2.Rodrigues(np.radians([0.0, 0.0, 239.0]))[0])
+        second = rotation_matrix_to_quaternion(cv2.Rodrigues(np.radians([0.0, 0.0, 241.0]))[0])
+        self.assertLess(np.dot(first, second), 0)
+
+        np.testing.assert_allclose(
+            quaternion_to_rotation_vector(quaternion_multiply(quaternion_conjugate(first), second)),
+            np.radians([0.0, 0.0, 2.0]), atol=1e-9)
+
+    def test_small_angles(self):
+        rotation_vector = np.array([1e-12, -2e-12, 3e-12])
+        np.testing.assert_allclose(
+            quaternion_to_rotation_vector(rotation_vector_to_quaternion(rotation_vector)), rotation_vector, atol=1e-15)
+
+    def test_multiply_by_conjugate_is_identity(self):
+        quaternion = rotation_vector_to_quaternion(np.array([0.3, -0.2, 0.1]))
+        np.testing.assert_allclose(quaternion_multiply(quaternion, quaternion_conjugate(quaternion)),
+                                   (1.0, 0.0, 0.0, 0.0), atol=1e-12)
+
+    def test_average_of_opposite_signs(self):
+        first = rotation_vector_to_quaternion(np.array([0.0, 0.0, 0.1]))
+        second = rotation_vector_to_quaternion(np.array([0.0, 0.0, 0.3]))
+
+        np.testing.assert_allclose(average_quaternions([first, -second]),
+                                   rotation_vector_to_quaternion(np.array([0.0, 0.0, 0.2])), atol=1e-9)
+
+
+if __name__ == '__main__':
+    unittest.main()
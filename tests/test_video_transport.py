@@ -0,0 +1,106 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from video_transport import CHUNK_HEADER, FrameChunker, FrameReassembler, is_video_chunk  # noqa: E402
+
+
+def encoded_frame(size, seed=0):
+    return bytes((seed + index) % 256 for index in range(size))
+
+
+class FrameTransportTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        chunker = FrameChunker(max_chunk_payload=100)
+        reassembler = FrameReassembler()
+        frame = encoded_frame(1050)
+
+        chunks = list(chunker.chunks(frame))
+        self.assertEqual(len(chunks), 11)
+        self.assertTrue(all(is_video_chunk(chunk) for chunk in chunks))
+        self.assertTrue(all(len(chunk) <= CHUNK_HEADER.size + 100 for chunk in chunks))
+
+        results = [reassembler.add(chunk, now=0.0) for chunk in chunks]
+        self.assertEqual(results[:-1], [None] * 10)
+        self.assertEqual(results[-1], (1, frame))
+
+    def test_empty_frame_is_one_chunk(self):
+        chunks = list(FrameChunker().chunks(b''))
+
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(FrameReassembler().add(chunks[0], now=0.0), (1, b''))
+
+    def test_reordered_chunks(self):
+        chunker = FrameChunker(max_chunk_payload=10)
+        reassembler = FrameReassembler()
+        frame = encoded_frame(45)
+
+        results = [reassembler.add(chunk, now=0.0) for chunk in reversed(list(chunker.chunks(frame)))]
+        self.assertEqual(results[-1], (1, frame))
+
+    def test_duplicate_chunk_is_ignored(self):
+        chunker = FrameChunker(max_chunk_payload=10)
+        reassembler = FrameReassembler()
+        first, second = chunker.chunks(encoded_frame(20))
+
+        self.assertIsNone(reassembler.add(first, now=0.0))
+        self.assertIsNone(reassembler.add(first, now=0.0))
+        self.assertEqual(reassembler.add(second, now=0.0), (1, encoded_frame(20)))
+
+    def test_older_frame_completed_late_is_dropped(self):
+        chunker = FrameChunker(max_chunk_payload=10)
+        reassembler = FrameReassembler()
+        old_chunks = list(chunker.chunks(encoded_frame(20, seed=1)))
+        new_chunks = list(chunker.chunks(encoded_frame(20, seed=2)))
+
+        reassembler.add(old_chunks[0], now=0.0)
+        for chunk in new_chunks:
+            result = reassembler.add(chunk, now=0.0)
+        self.assertEqual(result, (2, encoded_frame(20, seed=2)))
+        self.assertEqual(reassembler.dropped_frames, 1)
+
+        self.assertIsNone(reassembler.add(old_chunks[1], now=0.0))
+
+    def test_incomplete_frame_expires(self):
+        chunker = FrameChunker(max_chunk_payload=10)
+        reassembler = FrameReassembler(deadline=0.1)
+        lost_chunks = list(chunker.chunks(encoded_frame(20, seed=1)))
+        next_chunks = list(chunker.chunks(encoded_frame(20, seed=2)))
+
+        reassembler.add(lost_chunks[0], now=0.0)
+        reassembler.add(next_chunks[0], now=0.5)
+        self.assertEqual(reassembler.dropped_frames, 1)
+        self.assertEqual(reassembler.add(next_chunks[1], now=0.5), (2, encoded_frame(20, seed=2)))
+
+    def test_restarted_publisher(self):
+        reassembler = FrameReassembler()
+        chunker = FrameChunker(max_chunk_payload=10)
+        for seed in range(5):
+            for chunk in chunker.chunks(encoded_frame(20, seed=seed)):
+                result = reassembler.add(chunk, now=0.0)
+        self.assertEqual(result[0], 5)
+
+        # A restarted publisher numbers its frames from 1 again, they are not
+        # older than the ones already handed out.
+        chunker = FrameChunker(max_chunk_payload=10)
+        for seed in range(3):
+            for chunk in chunker.chunks(encoded_frame(20, seed=seed)):
+                result = reassembler.add(chunk, now=0.0)
+            self.assertEqual(result, (seed + 1, encoded_frame(20, seed=seed)))
+
+    def test_restart_drops_pending_frames(self):
+        reassembler = FrameReassembler()
+        stopped = list(FrameChunker(max_chunk_payload=10).chunks(encoded_frame(20)))
+        restarted = list(FrameChunker(max_chunk_payload=10).chunks(encoded_frame(20, seed=3)))
+
+        reassembler.add(stopped[0], now=0.0)
+        reassembler.add(restarted[0], now=0.0)
+        self.assertEqual(reassembler.dropped_frames, 1)
+        self.assertEqual(reassembler.add(restarted[1], now=0.0), (1, encoded_frame(20, seed=3)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,217 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from marker_detection import DetectionEngineSettings  # noqa: E402
+from marker_detection_settings import SingleMarkerDetectionSettings  # noqa: E402
+from pose_estimation import MarkerPoseEstimator  # noqa: E402
+from pose_filter import OPENCV_KALMAN_FILTER  # noqa: E402
+from video_source_calibration import CalibrationStore  # noqa: E402
+from frame_recording import FrameRecorder, RECORDING_EXTENSION  # noqa: E402
+from synthetic_scene import SyntheticScene, synthetic_cube  # noqa: E402
+from tracking import create_pose_filter, create_detection_result  # noqa: E402
+
+MARKER_LENGTH = 13.2
+
+# Name, then what differs from a marker 80 units away with a sharp,
+# noiseless image, detected at full resolution.
+SCENARIOS = [
+    ('marker', {}),
+    ('marker near', {'distance': 40}),
+    ('marker far', {'distance': 160}),
+    ('marker very far', {'distance': 260}),
+    ('marker blur 1.5', {'blur': 1.5}),
+    ('marker blur 3', {'blur': 3.0}),
+    ('marker noise 8', {'noise': 8}),
+    ('marker noise 20', {'noise': 20}),
+    ('cube', {'cube': True}),
+    ('cube far', {'cube': True, 'distance': 160}),
+    ('cube blur 1.5 noise 8', {'cube': True, 'blur': 1.5, 'noise': 8}),
+    ('marker scale 0.75', {'detection_scale': 0.75}),
+    ('marker scale 0.5', {'detection_scale': 0.5}),
+    ('marker far scale 0.75', {'distance': 160, 'detection_scale': 0.75}),
+    ('marker far scale 0.5', {'distance': 160, 'detection_scale': 0.5}),
+    ('cube scale 0.75', {'cube': True, 'detection_scale': 0.75}),
+    ('cube scale 0.5', {'cube': True, 'detection_scale': 0.5}),
+]
+
+STAGES = ('grayscale', 'detection', 'estimation', 'filter', 'encode')
+
+
+class TrackingBenchmark:
+
+    def __init__(self, frames=60, filter_engine=OPENCV_KALMAN_FILTER, frame_width=1280, frame_height=720, record_dir=None):
+        self.frames = frames
+        self.filter_engine = filter_engine
+        self.record_dir = record_dir
+        self.scene = SyntheticScene(frame_width, frame_height)
+        self.detection_engine_settings = DetectionEngineSettings(
+            "DICT_6X6_250", 7, 3, 23, 10, "CORNER_REFINE_CONTOUR", False, 0.5, 5, 1.0)
+
+    def run(self, scenario_names=None):
+        results = {}
+        for name, scenario in SCENARIOS:
+            if scenario_names and name not in scenario_names:
+                continue
+
+            results[name] = self.run_scenario(name, **scenario)
+            self.__print_result(name, results[name])
+
+        return results
+
+    def run_scenario(self, name, distance=80, blur=0.0, noise=0.0, cube=False, detection_scale=1.0):
+        if cube:
+            target = synthetic_cube(MARKER_LENGTH, 1, [2, 3, 4, 5], 6)
+        else:
+            target = SingleMarkerDetectionSettings(MARKER_LENGTH, 0)
+
+        # Rendering is not part of the measured pipeline.
+        random = np.random.RandomState(0)
+        frames = []
+        poses = []
+        for i in range(self.frames):
+            pose = self.__pose(i, distance, cube)
+            frames.append(self.scene.render([(target, pose)], blur, noise, random))
+            poses.append(pose)
+
+        if self.record_dir is not None:
+            self.__record(name, frames)
+
+        detection_engine_settings = DetectionEngineSettings.from_data(
+            dict(self.detection_engine_settings.to_data(), detection_scale=detection_scale))
+        estimator = MarkerPoseEstimator(
+            {name: target}, detection_engine_settings, np.eye(4), self.__calibration_store())
+        pose_filter = create_pose_filter(self.filter_engine, 1 / 30)
+
+        stage_times = dict.fromkeys(STAGES, 0.0)
+        raw_errors = []
+        filtered_errors = []
+        oscillation = False
+        for i, frame in enumerate(frames):
+            # Timed by the estimator, as in tracking.
+            _, _, estimated_poses = estimator.estimate(frame)
+            for stage, stage_time in estimator.stage_times.items():
+                stage_times[stage] += stage_time
+
+            rvec, tvec = estimated_poses[name]
+            if rvec is not None:
+                rot_mtx, _ = cv2.Rodrigues(rvec)
+                raw_errors.append(self.__pose_error(poses[i], rot_mtx, np.ravel(tvec)))
+
+            start = time.perf_counter()
+            detection_result, oscillation = create_detection_result(
+                rvec, tvec, i / 30, self.filter_engine, pose_filter, oscillation)
+            stage_times['filter'] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            json.dumps(detection_result)
+            stage_times['encode'] += time.perf_counter() - start
+
+            if detection_result['success']:
+                filtered_errors.append(self.__pose_error(poses[i], *self.__result_pose(detection_result)))
+
+        pipeline_time = sum(stage_times.values())
+        result = {'fps': {stage: self.frames / stage_time for stage, stage_time in stage_times.items()}}
+        result['fps']['pipeline'] = self.frames / pipeline_time
+        result['detection_rate'] = len(raw_errors) / self.frames
+        result['raw_error'] = self.__error_summary(raw_errors)
+        result['filtered_error'] = self.__error_summary(filtered_errors)
+
+        return result
+
+    def __pose(self, i, distance, cube):
+        # A target crossing the view while it turns.
+        t = i / max(1, self.frames - 1)
+        pose = np.eye(4)
+        pose[:3, 3] = (-0.15 * distance + 0.3 * distance * t, 0.05 * distance * np.sin(2 * np.pi * t), distance)
+
+        # Facing the camera, a cube tilted to also show two of its sides.
+        base = np.array([np.pi, 0, 0]) if not cube else np.array([2.2, 0.5, -0.4])
+        wobble = np.array([0.3 * np.sin(2 * np.pi * t), 0.3 * np.sin(4 * np.pi * t), 0.5 * t])
+        pose[:3, :3] = np.dot(cv2.Rodrigues(base)[0], cv2.Rodrigues(wobble)[0])
+
+        return pose
+
+    def __calibration_store(self):
+        # The store reads the camera parameters from files, once, when created.
+        with tempfile.TemporaryDirectory() as calibration_dir:
+            cam_mtx, dist = self.scene.camera_parameters()
+            cam_mtx_path = os.path.join(calibration_dir, 'cam_mtx.npy')
+            dist_path = os.path.join(calibration_dir, 'dist.npy')
+            np.save(cam_mtx_path, cam_mtx)
+            np.save(dist_path, dist)
+
+            return CalibrationStore(cam_mtx_path, dist_path)
+
+    def __record(self, name, frames):
+        recorder = FrameRecorder(os.path.join(self.record_dir, name.replace(' ', '_') + RECORDING_EXTENSION))
+        for i, frame in enumerate(frames):
+            recorder.write(frame, i / 30)
+        recorder.close()
+
+    @staticmethod
+    def __result_pose(detection_result):
+        rot_mtx = np.array([[detection_result['rotation_right_x'], detection_result['rotation_up_x'], detection_result['rotation_forward_x']],
+                            [detection_result['rotation_right_y'], detection_result['rotation_up_y'], detection_result['rotation_forward_y']],
+                            [detection_result['rotation_right_z'], detection_result['rotation_up_z'], detection_result['rotation_forward_z']]])
+        translation = np.array([detection_result['translation_x'], detection_result['translation_y'], detection_result['translation_z']])
+
+        return rot_mtx, translation
+
+    @staticmethod
+    def __pose_error(pose, rot_mtx, translation):
+        # Translation distance, and the angle of the rotation between both orientations in degrees.
+        cos_angle = (np.trace(np.dot(pose[:3, :3].T, rot_mtx)) - 1) / 2
+
+        return np.linalg.norm(translation - pose[:3, 3]), np.degrees(np.arccos(np.clip(cos_angle, -1.0, 1.0)))
+
+    @staticmethod
+    def __error_summary(errors):
+        if not errors:
+            return None
+
+        errors = np.array(errors)
+        return {
+            'translation_mean': float(np.mean(errors[:, 0])),
+            'translation_p95': float(np.percentile(errors[:, 0], 95)),
+            'rotation_mean': float(np.mean(errors[:, 1])),
+            'rotation_p95': float(np.percentile(errors[:, 1], 95))}
+
+    @staticmethod
+    def __print_result(name, result):
+        print("{}:".format(name))
+        print("  fps: {}".format(", ".join(
+            "{} {:.1f}".format(stage, fps) for stage, fps in result['fps'].items())))
+        print("  detection rate: {:.0%}".format(result['detection_rate']))
+        for error_name in ('raw_error', 'filtered_error'):
+            error = result[error_name]
+            if error is None:
+                print("  {}: no detections".format(error_name))
+            else:
+                print("  {}: translation mean {:.3f} p95 {:.3f}, rotation mean {:.2f} deg p95 {:.2f} deg".format(
+                    error_name, error['translation_mean'], error['translation_p95'],
+                    error['rotation_mean'], error['rotation_p95']))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tracking throughput and accuracy on synthetic scenes")
+    parser.add_argument('--frames', type=int, default=60, help="frames per scenario")
+    parser.add_argument('--filter', default=OPENCV_KALMAN_FILTER, help="pose filter engine")
+    parser.add_argument('--scenario', action='append', help="only run this scenario, may be repeated")
+    parser.add_argument('--output', help="also write the results to this JSON file")
+    parser.add_argument('--record', help="directory to save every scenario as a replayable recording")
+    args = parser.parse_args()
+
+    tracking_benchmark = TrackingBenchmark(args.frames, args.filter, record_dir=args.record)
+    benchmark_results = tracking_benchmark.run(args.scenario)
+
+    if args.output is not None:
+        with open(args.output, 'w') as output:
+            json.dump(benchmark_results, output, indent=2)